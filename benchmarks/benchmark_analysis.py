@@ -0,0 +1,89 @@
+"""
+Benchmark for the audio analysis pipeline
+
+Generates a synthetic practice session (plucked notes separated by silence)
+as int16 samples, like the data from AudioRecorder.get_audio_data, and
+reports analysis time and memory use.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_analysis --seconds 120
+"""
+import argparse
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from src.analyze_audio import AudioAnalyzer
+
+
+def make_session(seconds, sample_rate, active_fraction=0.3, seed=0):
+    """Build an int16 recording where roughly active_fraction of the time has notes"""
+    rng = np.random.default_rng(seed)
+    audio = np.zeros(int(seconds * sample_rate), dtype=np.float32)
+    note_length = int(0.5 * sample_rate)
+    t = np.arange(note_length) / sample_rate
+    envelope = np.exp(-4 * t).astype(np.float32)
+
+    # Place half-second notes at random positions until the target density is reached
+    n_notes = int(seconds * active_fraction / 0.5)
+    starts = np.sort(rng.choice(len(audio) - note_length, size=n_notes, replace=False))
+    frequencies = 82.41 * 2 ** (rng.integers(0, 36, size=n_notes) / 12)
+    for start, freq in zip(starts, frequencies):
+        audio[start:start + note_length] += 0.5 * envelope * np.sin(2 * np.pi * freq * t)
+
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in megabytes"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    if sys.platform == 'darwin':
+        return usage / (1024 * 1024)
+    return usage / 1024
+
+
+def run(seconds, sample_rate, active_fraction, note_timing):
+    """Analyze one synthetic session and print timing and memory figures"""
+    analyzer = AudioAnalyzer()
+    analyzer.note_timing = note_timing
+    audio = make_session(seconds, sample_rate, active_fraction)
+
+    # Warm up librosa's compiled code paths so they are not part of the timing
+    analyzer.analyze_audio_data(make_session(3, sample_rate, 0.5), sample_rate)
+    rss_before = peak_rss_mb()
+
+    start_time = time.perf_counter()
+    detected_notes = analyzer.analyze_audio_data(audio, sample_rate)
+    elapsed = time.perf_counter() - start_time
+
+    # Trace allocations in a separate run, since tracing slows analysis down
+    tracemalloc.start()
+    analyzer.analyze_audio_data(audio, sample_rate)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    active = sum(end - start for start, end, is_active in analyzer.activity_timeline if is_active)
+    print(f"Input: {seconds}s at {sample_rate} Hz ({audio.nbytes / 1e6:.1f} MB int16), "
+          f"{active:.1f}s active, {note_timing} note timing")
+    print(f"Analysis time: {elapsed:.2f}s ({seconds / elapsed:.1f}x realtime)")
+    print(f"Notes detected: {len(detected_notes)}")
+    print(f"Peak traced allocations: {traced_peak / 1e6:.1f} MB")
+    print(f"Peak RSS: {peak_rss_mb():.1f} MB (before analysis: {rss_before:.1f} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the audio analysis pipeline")
+    parser.add_argument('--seconds', type=float, default=60, help="length of the synthetic recording")
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--active', type=float, default=0.3, help="fraction of the recording with notes")
+    parser.add_argument('--note-timing', choices=('onset', 'grid'), default='onset')
+    args = parser.parse_args()
+    run(args.seconds, args.sample_rate, args.active, args.note_timing)
+
+
+if __name__ == "__main__":
+    main()
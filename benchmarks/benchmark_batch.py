@@ -0,0 +1,61 @@
+"""
+Benchmark for batch analysis of many short clips
+
+Compares AudioAnalyzer.analyze_batch with a Python loop of
+analyze_audio_data calls over the same synthetic phrase samples.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_batch --clips 500
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.benchmark_analysis import make_session
+from src.analyze_audio import AudioAnalyzer
+
+
+def run(n_clips, sample_rate, batch_size, note_timing, repeats):
+    """Time a loop of single calls against batched calls on 2-5 s clips, best of repeats"""
+    rng = np.random.default_rng(0)
+    clips = [make_session(rng.uniform(2, 5), sample_rate, 0.6, seed=i) for i in range(n_clips)]
+    analyzer = AudioAnalyzer()
+    analyzer.note_timing = note_timing
+
+    # Warm up librosa's compiled code paths so they are not part of the timing
+    analyzer.analyze_audio_data(clips[0], sample_rate)
+    analyzer.analyze_batch(clips[:2], sample_rate)
+
+    loop_time = batch_time = float('inf')
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        looped = [analyzer.analyze_audio_data(clip, sample_rate) for clip in clips]
+        loop_time = min(loop_time, time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        batched = []
+        for start in range(0, n_clips, batch_size):
+            batched.extend(analyzer.analyze_batch(clips[start:start + batch_size], sample_rate))
+        batch_time = min(batch_time, time.perf_counter() - start_time)
+
+    print(f"{n_clips} clips, {note_timing} note timing, batches of {batch_size}, best of {repeats}")
+    print(f"Loop of single calls: {loop_time:.2f}s ({n_clips / loop_time:.0f} clips/s)")
+    print(f"Batched:              {batch_time:.2f}s ({n_clips / batch_time:.0f} clips/s)")
+    print(f"Speedup: {loop_time / batch_time:.1f}x")
+    print(f"Notes found: {sum(map(len, looped))} looped, {sum(map(len, batched))} batched")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch analysis of short clips")
+    parser.add_argument('--clips', type=int, default=500)
+    parser.add_argument('--sample-rate', type=int, default=44100)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--note-timing', choices=('onset', 'grid'), default='onset')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    run(args.clips, args.sample_rate, args.batch_size, args.note_timing, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
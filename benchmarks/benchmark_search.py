@@ -0,0 +1,65 @@
+"""
+Benchmark for melodic phrase search
+
+Builds a MelodyIndex over a synthetic library of transcribed recordings
+and reports build time and query latency.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_search --recordings 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.melody_search import MelodyIndex
+
+
+def run(n_recordings, notes_per_recording, n_queries, phrase_lengths):
+    """Index a random library, then time searches for phrases taken from it"""
+    rng = np.random.default_rng(0)
+    library = [rng.integers(40, 76, size=notes_per_recording) for _ in range(n_recordings)]
+
+    index = MelodyIndex()
+    start_time = time.perf_counter()
+    for recording_id, midi in enumerate(library):
+        index.add_recording(recording_id, midi)
+    build_time = time.perf_counter() - start_time
+    print(f"Indexed {n_recordings} recordings of {notes_per_recording} notes in {build_time:.1f}s "
+          f"({len(index.index)} distinct n-grams)")
+
+    # Short phrases and phrases with several mismatches are answered from
+    # the single-interval index, longer strict ones from the n-gram index
+    for phrase_length in phrase_lengths:
+        for max_mismatches in (0, 1, 2):
+            if max_mismatches >= phrase_length - 1:
+                continue
+            latencies = []
+            n_matches = 0
+            for _ in range(n_queries):
+                recording = library[rng.integers(n_recordings)]
+                start = rng.integers(notes_per_recording - phrase_length)
+                phrase = recording[start:start + phrase_length] + rng.integers(-5, 6)
+
+                query_start = time.perf_counter()
+                n_matches += len(index.search(phrase, max_mismatches=max_mismatches))
+                latencies.append(time.perf_counter() - query_start)
+
+            latencies = np.array(latencies) * 1000
+            print(f"{phrase_length}-note phrases with {max_mismatches} mismatches: "
+                  f"median {np.median(latencies):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+                  f"max {latencies.max():.1f} ms, {n_matches / n_queries:.0f} matches per query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark melodic phrase search")
+    parser.add_argument('--recordings', type=int, default=10000)
+    parser.add_argument('--notes', type=int, default=300, help="notes per recording")
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--phrase-lengths', type=int, nargs='+', default=[3, 4, 8])
+    args = parser.parse_args()
+    run(args.recordings, args.notes, args.queries, args.phrase_lengths)
+
+
+if __name__ == "__main__":
+    main()
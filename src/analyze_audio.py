@@ -1,10 +1,165 @@
 """
 Module for analyzing audio and detecting guitar notes
 """
+import math
 import numpy as np
 import librosa
+import scipy.fft
+import scipy.ndimage
 import os
 
+# Chromatic note names, used for converting between note names and MIDI numbers
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# Compact record layout for detected note events. Strings and frets that
+# could not be mapped are stored as -1.
+NOTE_EVENT_DTYPE = np.dtype([
+    ('time', np.float32),
+    ('midi', np.int8),
+    ('string', np.int8),
+    ('fret', np.int8),
+])
+
+
+def note_name_to_midi(note):
+    """Convert a note name such as 'A4' or 'C#3' to its MIDI number"""
+    return (int(note[-1]) + 1) * 12 + NOTE_NAMES.index(note[:-1])
+
+
+def midi_to_note_name(midi):
+    """Convert a MIDI number to a note name such as 'A4' or 'C#3'"""
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+def notes_to_array(detected_notes):
+    """
+    Pack a list of (time, note, string, fret) tuples into a compact array
+
+    Arrays that are already in this layout are returned as they are.
+    Returns a structured numpy array with NOTE_EVENT_DTYPE records
+    """
+    if isinstance(detected_notes, np.ndarray) and detected_notes.dtype == NOTE_EVENT_DTYPE:
+        return detected_notes
+    events = np.empty(len(detected_notes), dtype=NOTE_EVENT_DTYPE)
+    for i, (time, note, string, fret) in enumerate(detected_notes):
+        events[i] = (
+            time,
+            note_name_to_midi(note),
+            -1 if string is None else string,
+            -1 if fret is None else fret,
+        )
+    return events
+
+
+def to_float32(audio_data):
+    """
+    Convert audio samples to float32 in the range [-1, 1]
+    
+    Signed integer samples (e.g. the int16 data from
+    AudioRecorder.get_audio_data) are scaled by their full-scale value.
+    Unsigned samples (e.g. 8-bit WAV data) are centred on their midpoint
+    first. Float input is only converted if it is not float32 already, so
+    this never makes an unnecessary copy.
+    """
+    audio_data = np.asarray(audio_data)
+    if np.issubdtype(audio_data.dtype, np.unsignedinteger):
+        midpoint = np.float32(2 ** (np.iinfo(audio_data.dtype).bits - 1))
+        return (audio_data.astype(np.float32) - midpoint) / midpoint
+    if np.issubdtype(audio_data.dtype, np.integer):
+        scale = np.float32(1.0 / -np.iinfo(audio_data.dtype).min)
+        return audio_data.astype(np.float32) * scale
+    return audio_data.astype(np.float32, copy=False)
+
+
+def estimate_pitch(samples, sample_rate, min_freq=75, max_freq=1400, threshold=0.9, min_clarity=0.6):
+    """
+    Estimate the fundamental frequency of a short buffer of samples
+
+    Uses the normalized square difference function (McLeod pitch method),
+    computed with one FFT, so the cost is fixed for a given buffer length.
+    The first peak within threshold of the highest peak is chosen, which
+    avoids locking on to an octave below the fundamental.
+
+    Returns a tuple of (frequency, clarity), or (None, clarity) if no clear
+    pitch was found. Clarity is between 0 and 1.
+    """
+    frequencies, clarities = estimate_pitches([samples], sample_rate, min_freq, max_freq, threshold, min_clarity)
+    frequency = None if np.isnan(frequencies[0]) else float(frequencies[0])
+    return frequency, float(clarities[0])
+
+
+def estimate_pitches(buffers, sample_rate, min_freq=75, max_freq=1400, threshold=0.9, min_clarity=0.6):
+    """
+    Estimate the fundamental frequency of many buffers at once
+
+    Same method as estimate_pitch, but every buffer goes through a single
+    batched FFT and the peak picking is vectorized across buffers. Buffers
+    may have different lengths.
+
+    Returns a tuple of (frequencies, clarities) arrays, with NaN frequencies
+    where no clear pitch was found
+    """
+    lengths = np.array([len(buffer) for buffer in buffers], dtype=np.int64)
+    n_buffers = len(buffers)
+    frequencies = np.full(n_buffers, np.nan)
+    clarities = np.zeros(n_buffers)
+    if n_buffers == 0 or lengths.max() < 4:
+        return frequencies, clarities
+
+    # Zero-padded batch with each row's mean removed over its own length
+    n = int(lengths.max())
+    x = np.zeros((n_buffers, n), dtype=np.float32)
+    for i, buffer in enumerate(buffers):
+        if len(buffer):
+            x[i, :len(buffer)] = buffer - np.mean(buffer, dtype=np.float64)
+
+    min_lag = max(1, int(sample_rate / max_freq))
+    row_max_lag = np.minimum(lengths - 2, int(math.ceil(sample_rate / min_freq)))
+    max_lag = int(row_max_lag.max())
+    valid = (row_max_lag > min_lag) & np.any(x, axis=1)
+    if max_lag <= min_lag or not valid.any():
+        return frequencies, clarities
+
+    # Autocorrelation via FFT, zero-padded to avoid circular wraparound
+    fft_size = 1 << (2 * n - 1).bit_length()
+    spectrum = scipy.fft.rfft(x, fft_size, axis=1, workers=-1)
+    acf = scipy.fft.irfft(spectrum * np.conj(spectrum), fft_size, axis=1, workers=-1)[:, :max_lag + 2]
+
+    # m(tau) = sum of x[j]^2 + x[j + tau]^2 over the overlapping part of each row
+    energy = np.zeros((n_buffers, n + 1))
+    np.cumsum(x.astype(np.float64) ** 2, axis=1, out=energy[:, 1:])
+    lags = np.arange(max_lag + 2)
+    total = np.take_along_axis(energy, lengths[:, np.newaxis], axis=1)
+    tail = np.take_along_axis(energy, np.maximum(lengths[:, np.newaxis] - lags, 0), axis=1)
+    m = tail + (total - energy[:, :max_lag + 2])
+    nsdf = 2 * acf / np.maximum(m, 1e-12)
+
+    # Candidate peaks: local maxima within each row's lag range, after the
+    # autocorrelation has first gone negative
+    negative = nsdf[:, :max_lag + 1] < 0
+    valid &= negative.any(axis=1)
+    first_lag = np.maximum(min_lag, negative.argmax(axis=1))
+    middle = nsdf[:, 1:max_lag + 1]
+    in_range = (lags[1:max_lag + 1] >= first_lag[:, np.newaxis]) & (lags[1:max_lag + 1] <= row_max_lag[:, np.newaxis])
+    is_peak = (middle > nsdf[:, :max_lag]) & (middle >= nsdf[:, 2:max_lag + 2]) & (middle > 0) & in_range
+    valid &= is_peak.any(axis=1)
+
+    best = np.where(is_peak, middle, -np.inf).max(axis=1)
+    lag = 1 + np.argmax(is_peak & (middle >= threshold * best[:, np.newaxis]), axis=1)
+    rows = np.arange(n_buffers)
+    clarity = nsdf[rows, lag]
+    clarities[valid] = clarity[valid]
+    valid &= clarity >= min_clarity
+
+    # Parabolic interpolation around the peak for sub-sample accuracy
+    left, centre, right = nsdf[rows, lag - 1], clarity, nsdf[rows, lag + 1]
+    denominator = left - 2 * centre + right
+    safe = np.where(denominator != 0, denominator, 1)
+    shift = np.where(denominator != 0, 0.5 * (left - right) / safe, 0.0)
+    frequencies[valid] = sample_rate / (lag[valid] + shift[valid])
+    return frequencies, clarities
+
+
 class AudioAnalyzer:
     def __init__(self):
         """Initialize the audio analyzer with guitar-specific settings"""
@@ -25,10 +180,57 @@ class AudioAnalyzer:
         # Note frequencies for mapping (all notes across the fretboard)
         self.note_frequencies = self._generate_note_frequencies()
         
+        # The same notes as arrays, with each note's string and fret, for
+        # mapping many frequencies at once
+        self._note_names = list(self.note_frequencies)
+        self._note_values = np.array(list(self.note_frequencies.values()))
+        self._note_positions = [self._map_to_guitar_note(freq) for freq in self._note_values]
+        
+        # Silence gate settings: block size in samples, on/off thresholds in dB
+        # relative to the loudest block, and blocks of padding around regions
+        self.gate_block_size = 2048
+        self.gate_on_db = -40
+        self.gate_off_db = -50
+        self.gate_padding_blocks = 1
+        
+        # Note timing: 'onset' estimates one pitch per detected onset, 'grid'
+        # samples piptrack every 0.1 seconds
+        self.note_timing = 'onset'
+        
+        # Onset detection settings: spectral flux frame size and hop in
+        # samples, peak threshold relative to the strongest onset, minimum
+        # flux (mean rise in log magnitude per frequency bin) for any onset,
+        # minimum gap between onsets in seconds, minimum rise in energy in
+        # dB, and the window in seconds the rise is confirmed over
+        self.onset_n_fft = 1024
+        self.onset_hop_length = 512
+        self.onset_delta = 0.07
+        self.onset_min_flux = 0.05
+        self.onset_min_gap = 0.03
+        self.onset_min_rise_db = 0.5
+        self.onset_confirm_window = 0.03
+        
+        # Pitch window after each onset: skip the pick attack, then analyze
+        # at most this many seconds (less if the next onset comes sooner)
+        self.onset_pitch_delay = 0.01
+        self.onset_pitch_window = 0.06
+        
+        # Largest number of samples (regions x padded length) analyze_batch
+        # stacks into one computation
+        self.batch_max_samples = 2 ** 22
+        
+        # Frames per FFT call (across all signals of a batch) when computing
+        # spectral flux
+        self.spectral_block_frames = 256
+        
+        # Active/inactive timeline of the last analyzed signal, as a list of
+        # (start_time, end_time, is_active) tuples
+        self.activity_timeline = []
+        
     def _generate_note_frequencies(self):
         """Generate a dictionary of note frequencies across the guitar range"""
         # Base frequencies for the chromatic scale starting at C0
-        base_notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        base_notes = NOTE_NAMES
         base_freq = 16.35  # C0
         
         notes_dict = {}
@@ -53,13 +255,344 @@ class AudioAnalyzer:
             raise FileNotFoundError(f"Audio file not found: {file_path}")
         
         # Load the audio file with librosa
-        y, sr = librosa.load(file_path, sr=None)
+        y, sr = librosa.load(file_path, sr=None, dtype=np.float32)
+        
+        return self._detect_notes(y, sr)
+    
+    def analyze_audio_data(self, audio_data, sample_rate):
+        """
+        Analyze audio data directly from a numpy array
+        
+        Returns a list of (time, note, string, fret) tuples
+        """
+        return self._detect_notes(to_float32(audio_data), sample_rate)
+    
+    def analyze_buffer_views(self, views, sample_rate):
+        """
+        Analyze audio held in shared memory, e.g. the views returned by
+        SharedRingBuffer.read or AudioRecorder.get_capture_views
+    
+        The views are consecutive pieces of one signal. They are read in
+        place, so the only copy made is the conversion to float32.
+    
+        Returns a list of (time, note, string, fret) tuples
+        """
+        if len(views) == 1:
+            y = to_float32(views[0])
+        else:
+            y = np.concatenate([to_float32(view) for view in views])
+        return self._detect_notes(y, sample_rate)
+    
+    def analyze_batch(self, clips, sample_rate):
+        """
+        Analyze many short clips (numpy arrays) in batched computations
+        
+        Each clip goes through the silence gate, then the active regions of
+        all clips are zero-padded, stacked and analyzed together, so with
+        onset note timing the onset picking, onset refinement and pitch
+        stages run once per batch rather than once per clip. The results
+        match calling analyze_audio_data on each clip, except that
+        activity_timeline is left unchanged.
+        
+        Returns one list of (time, note, string, fret) tuples per clip, with
+        times relative to the start of each clip
+        """
+        clips = [to_float32(clip) for clip in clips]
+        segments = []
+        for i, clip in enumerate(clips):
+            for start, end in self._find_active_regions(clip, sample_rate):
+                segments.append((i, start, end))
+        
+        # Batch regions of similar length together so little work is spent
+        # on padding, and keep each batch small enough for the spectral
+        # buffers to stay a manageable size
+        segments.sort(key=lambda segment: segment[2] - segment[1])
+        results = [[] for _ in clips]
+        first = 0
+        while first < len(segments):
+            last = first + 1
+            while (last < len(segments)
+                   and (last - first + 1) * (segments[last][2] - segments[last][1]) <= self.batch_max_samples):
+                last += 1
+            group = segments[first:last]
+            signals = [clips[i][start:end] for i, start, end in group]
+            offsets = [start / sample_rate for _, start, _ in group]
+            for (i, _, _), detected_notes in zip(group, self._analyze_stacked(signals, sample_rate, offsets)):
+                results[i].extend(detected_notes)
+            first = last
+        
+        for detected_notes in results:
+            detected_notes.sort(key=lambda detected_note: detected_note[0])
+        return results
+    
+    def _analyze_stacked(self, signals, sr, offsets):
+        """
+        Analyze a group of signals as a single zero-padded 2-D batch
+        
+        offsets are the start times of each signal within its clip. Returns
+        one list of (time, note, string, fret) tuples per signal.
+        """
+        if self.note_timing == 'grid':
+            # librosa's piptrack is slower on 2-D input than on one row at a
+            # time, so the legacy grid timing is not batched
+            return [self._detect_notes_on_grid(signal, sr, offset) for signal, offset in zip(signals, offsets)]
+        
+        lengths = np.array([len(signal) for signal in signals])
+        batch = np.zeros((len(signals), lengths.max()), dtype=np.float32)
+        for i, signal in enumerate(signals):
+            batch[i, :len(signal)] = signal
+        return self._notes_at_onsets_stacked(batch, lengths, sr, offsets)
+    
+    def _detect_notes(self, y, sr):
+        """
+        Run pitch tracking over the active (non-silent) regions of a signal
+        
+        The activity timeline found by the silence gate is kept in
+        self.activity_timeline so the UI can display it.
+        
+        Returns a list of (time, note, string, fret) tuples
+        """
+        regions = self._find_active_regions(y, sr)
+        self.activity_timeline = self._build_activity_timeline(regions, len(y), sr)
+        
+        if self.note_timing == 'grid':
+            detect = self._detect_notes_on_grid
+        else:
+            detect = self._detect_notes_at_onsets
+        
+        detected_notes = []
+        for start, end in regions:
+            detected_notes.extend(detect(y[start:end], sr, start / sr))
+        
+        return detected_notes
+    
+    def _detect_notes_at_onsets(self, y, sr, offset):
+        """
+        Estimate one pitch per note onset in a region of audio
+        
+        Pitch is only estimated in a short window after each onset; the rest
+        of the note is assumed to hold that pitch, so the work depends on the
+        number of notes rather than the length of the audio.
+        
+        Returns a list of (time, note, string, fret) tuples
+        """
+        return self._notes_at_onsets_stacked(y[np.newaxis], np.array([len(y)]), sr, [offset])[0]
+    
+    def _notes_at_onsets_stacked(self, batch, lengths, sr, offsets):
+        """
+        Estimate one pitch per note onset in each row of a zero-padded batch
+        
+        lengths are the lengths of the signals in the rows, and offsets their
+        start times. Each stage runs once for the whole batch rather than
+        once per row. Returns one list of (time, note, string, fret) tuples
+        per row.
+        """
+        rows, onsets = self._detect_onsets_stacked(batch, lengths, sr)
+        windows = self._onset_pitch_windows(batch, lengths, sr, rows, onsets)
+        pitches, _ = estimate_pitches(windows, sr, self.min_freq, self.max_freq)
+        return self._notes_from_onsets(rows, onsets, pitches, sr, offsets)
+    
+    def _onset_pitch_windows(self, batch, lengths, sr, rows, onsets):
+        """The slices of audio to estimate pitch from, one per onset"""
+        # A window stops at the next onset in the same row, or the row's end
+        boundaries = lengths[rows]
+        same_row = rows[1:] == rows[:-1]
+        boundaries[:-1][same_row] = onsets[1:][same_row]
+        starts = onsets + int(self.onset_pitch_delay * sr)
+        ends = np.minimum(starts + int(self.onset_pitch_window * sr), boundaries)
+        return [batch[row, start:end] for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist())]
+    
+    def _notes_from_onsets(self, rows, onsets, pitches, sr, offsets):
+        """
+        Turn onset positions and their pitches (NaN if unclear) into note tuples
+        
+        Returns one list of (time, note, string, fret) tuples per row
+        """
+        detected_notes = [[] for _ in offsets]
+        found = ~np.isnan(pitches)
+        closest = np.abs(pitches[found, np.newaxis] - self._note_values).argmin(axis=1)
+        for row, onset, note in zip(rows[found].tolist(), onsets[found].tolist(), closest.tolist()):
+            note, string, fret = self._note_positions[note]
+            detected_notes[row].append((round(offsets[row] + onset / sr, 3), note, string, fret))
+        return detected_notes
+    
+    def _detect_onsets(self, y, sr):
+        """
+        Find note onsets in a signal (see _detect_onsets_stacked)
         
+        Returns an array of onset positions in samples
+        """
+        _, onsets = self._detect_onsets_stacked(y[np.newaxis], np.array([len(y)]), sr)
+        return onsets
+    
+    def _detect_onsets_stacked(self, batch, lengths, sr):
+        """
+        Find note onsets in each row of a zero-padded batch of signals
+        
+        Spectral flux (the increase in log magnitude between frames) locates
+        onsets to within a frame. Each onset is then moved to the sample with
+        the sharpest rise in energy around that frame, and kept only if the
+        energy after it really is higher than before. Peaks of all rows are
+        picked and refined together.
+        
+        Returns arrays of the row and the position in samples of each onset,
+        ordered by row and then by position
+        """
+        n_fft = self.onset_n_fft
+        hop = self.onset_hop_length
+        
+        # Frames that run past the end of a signal see the sound stop, which
+        # changes the spectrum without being an onset; a signal shorter than
+        # one frame has no onsets at all
+        n_frames = np.where(lengths >= n_fft, (lengths - n_fft // 2) // hop + 1, 0)
+        flux = self._spectral_flux(batch, n_frames)
+        
+        # Peaks are picked relative to the strongest onset in each signal, but
+        # must also pass the absolute floor; otherwise, in a signal with no
+        # real onset, the ripple of a sustained note would be scaled up into
+        # peaks. peak_pick never picks its first value, so a silent frame is
+        # put in front for an onset in the first frame to be found.
+        strongest = flux.max(axis=1)
+        strongest[strongest < self.onset_min_flux] = np.inf
+        normalized = np.zeros((len(flux), flux.shape[1] + 1))
+        normalized[:, 1:] = flux / strongest[:, np.newaxis]
+        frames_per_second = sr / hop
+        wait = max(1, int(self.onset_min_gap * frames_per_second))
+        peaks = librosa.util.peak_pick(
+            normalized,
+            pre_max=wait, post_max=1,
+            pre_avg=int(0.05 * frames_per_second), post_avg=1,
+            delta=self.onset_delta, wait=wait, sparse=False
+        )[:, 1:]
+        peaks &= flux >= self.onset_min_flux
+        rows, frames = np.nonzero(peaks)
+        
+        # With centred frames, frame f covers samples f*hop - n_fft/2 to
+        # f*hop + n_fft/2, and its flux compares it with the previous frame,
+        # so the onset is searched for from f*hop - n_fft to f*hop + n_fft/2.
+        # The energy (cumulative sum of squares) is taken over that range plus
+        # a margin for the windows below. Samples outside a signal are silent.
+        span = int(np.ceil(sr / self.min_freq / 2))
+        confirm = int(self.onset_confirm_window * sr)
+        margin = max(span, confirm)
+        n_positions = n_fft + n_fft // 2
+        first = frames * hop - n_fft - margin
+        index = first[:, np.newaxis] + np.arange(n_positions + 2 * margin)
+        inside = (index >= 0) & (index < lengths[rows, np.newaxis])
+        np.clip(index, 0, batch.shape[1] - 1, out=index)
+        index += (rows * batch.shape[1])[:, np.newaxis]
+        samples = np.take(batch, index).astype(np.float64)
+        samples *= samples
+        samples *= inside
+        energy = np.zeros((len(rows), index.shape[1] + 1))
+        np.cumsum(samples, axis=1, out=energy[:, 1:])
+        
+        # Compare the energy just after each sample with the energy just
+        # before it; the ratio peaks where a note starts. Half a period of
+        # the lowest note is short enough not to be smeared by the previous
+        # note ringing on, and a whole number of half-periods of a sine has
+        # the same energy whatever its phase.
+        positions = slice(margin, margin + n_positions)
+        after = energy[:, margin + span:margin + span + n_positions] - energy[:, positions]
+        before = energy[:, positions] - energy[:, margin - span:margin - span + n_positions]
+        rise = np.log(after + 1e-10) - np.log(before + 1e-10)
+        rise[~inside[:, positions]] = -np.inf
+        best = rise.argmax(axis=1)
+        min_rise = np.log(10 ** (self.onset_min_rise_db / 10))
+        refined = rise[np.arange(len(rows)), best] >= min_rise
+        onsets = first + margin + best
+        
+        # Flux peaks without a real rise in energy (e.g. the click where
+        # a note or region is cut off) are not onsets. The half-period
+        # ratio swings by a few dB when two notes ring together, so the
+        # rise is confirmed with the mean power over longer windows. The
+        # window before stops at the previous onset, so a fast note is
+        # not compared with the attack of the one before it. That makes each
+        # onset depend on the one accepted before it, so the peaks are taken
+        # in turn: the first peak of every row together, then the second...
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        previous = np.full(len(batch), -1)
+        accepted = np.zeros(len(rows), dtype=bool)
+        for turn in range(rank.max() + 1 if len(rank) else 0):
+            peak = np.flatnonzero((rank == turn) & refined)
+            row = rows[peak]
+            onset = onsets[peak]
+            start = np.maximum(onset - confirm, np.maximum(previous[row], 0))
+            end = np.minimum(onset + confirm, lengths[row])
+            power_before = (energy[peak, onset - first[peak]] - energy[peak, start - first[peak]]) / np.maximum(onset - start, 1)
+            power_after = (energy[peak, end - first[peak]] - energy[peak, onset - first[peak]]) / np.maximum(end - onset, 1)
+            keep = (onset > previous[row]) & (np.log(power_after + 1e-12) - np.log(power_before + 1e-12) >= min_rise)
+            accepted[peak[keep]] = True
+            previous[row[keep]] = onset[keep]
+        
+        return rows[accepted], onsets[accepted].astype(np.int64)
+    
+    def _spectral_flux(self, y, n_frames=None):
+        """
+        Spectral flux of a signal, or of each row of a 2-D batch of signals
+        
+        Frames are centred and Hann-windowed like librosa.stft, and go
+        through the FFT about spectral_block_frames at a time, taken from all
+        rows of a batch together, so the spectra being worked on stay in cache
+        however long the signal or large the batch.
+        The first frame is compared with silence, so a note that starts right
+        at the beginning still has an onset.
+        
+        n_frames optionally limits the frames computed for each row of a
+        batch, e.g. to leave out the zero padding; the rest are left at 0.
+        
+        Returns the mean rise in log magnitude per frequency bin, with one
+        value per onset frame along the last axis
+        """
+        n_fft = self.onset_n_fft
+        padding = [(0, 0)] * (y.ndim - 1) + [(n_fft // 2, n_fft // 2)]
+        frames = np.lib.stride_tricks.sliding_window_view(np.pad(y, padding), n_fft, axis=-1)
+        frames = frames[..., ::self.onset_hop_length, :]
+        
+        window = np.hanning(n_fft + 1)[:-1].astype(np.float32)
+        frames = frames.reshape((-1,) + frames.shape[-2:])
+        n_rows, n_total = frames.shape[:2]
+        if n_frames is None:
+            n_frames = np.full(n_rows, n_total)
+        flux = np.zeros((n_rows, n_total), dtype=np.float32)
+        
+        # Each FFT call takes the next few frames of every row that has any
+        # left, with the last spectrum of each row carried over to the next
+        previous = np.zeros((n_rows, 1, n_fft // 2 + 1), dtype=np.float32)
+        start = 0
+        end = n_frames.max(initial=0)
+        while start < end:
+            rows = np.flatnonzero(n_frames > start)
+            stop = min(start + max(1, self.spectral_block_frames // len(rows)), end)
+            if rows[-1] - rows[0] + 1 == len(rows):
+                # Batches sorted by length keep the rows left together, so
+                # they can be sliced rather than copied out
+                rows = slice(rows[0], rows[-1] + 1)
+            log_spectrum = np.abs(scipy.fft.rfft(frames[rows, start:stop] * window, axis=-1, workers=-1))
+            log_spectrum *= 100
+            np.log1p(log_spectrum, out=log_spectrum)
+            rise = np.diff(log_spectrum, axis=1, prepend=previous[rows])
+            np.maximum(rise, 0, out=rise)
+            flux[rows, start:stop] = rise.mean(axis=-1)
+            previous[rows] = log_spectrum[:, -1:]
+            start = stop
+        
+        # Rows that ran out of frames partway through a block are cut back
+        flux[np.arange(n_total) >= n_frames[:, None]] = 0
+        return flux.reshape(y.shape[:-1] + (-1,))
+    
+    def _detect_notes_on_grid(self, y, sr, offset):
+        """
+        Run librosa's pitch tracking over one region of audio
+        
+        offset is the start time of the region in seconds, so the returned
+        note times are relative to the start of the whole recording.
+        """
         # Use librosa's pitch tracking
         pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
         
         # Extract the strongest pitches over time
-        times = librosa.times_like(pitches)
+        times = librosa.times_like(pitches, sr=sr) + offset
         detected_notes = []
         
         # Process each frame
@@ -76,40 +609,102 @@ class AudioAnalyzer:
                 # Map to the closest guitar note
                 note, string, fret = self._map_to_guitar_note(pitch)
                 if note:
-                    detected_notes.append((time, note, string, fret))
+                    detected_notes.append((float(time), note, string, fret))
         
         return detected_notes
     
-    def analyze_audio_data(self, audio_data, sample_rate):
+    def _find_active_regions(self, y, sr):
         """
-        Analyze audio data directly from a numpy array
+        Find the regions of a signal that contain sound, using block RMS with hysteresis
         
-        Returns a list of (time, note, string, fret) tuples
+        A region opens when a block rises above the "on" threshold and only
+        closes once a block falls below the lower "off" threshold, so notes
+        decaying towards silence are not chopped up. Thresholds are relative
+        to the loudest block, which keeps the gate independent of the input
+        scaling (int16 samples or floats in [-1, 1]).
+        
+        Returns a list of (start_sample, end_sample) tuples
         """
-        # Use librosa's pitch tracking on the numpy array
-        pitches, magnitudes = librosa.piptrack(y=audio_data.astype(float), sr=sample_rate)
+        block = self.gate_block_size
+        n_blocks = int(np.ceil(len(y) / block))
+        if n_blocks == 0:
+            return []
         
-        # Extract the strongest pitches over time
-        times = librosa.times_like(pitches)
-        detected_notes = []
+        # Block RMS, zero-padding the last partial block. The full blocks are
+        # summed through a reshaped view, so no copy of the signal is made.
+        n_full = len(y) // block
+        full = y[:n_full * block].reshape(n_full, block)
+        power = np.empty(n_blocks)
+        power[:n_full] = np.einsum('ij,ij->i', full, full)
+        if n_full < n_blocks:
+            tail = y[n_full * block:]
+            power[n_full] = np.dot(tail, tail)
+        rms = np.sqrt(power / block)
         
-        # Process each frame
-        for t, time in enumerate(times):
-            # Only process frames every 0.1 seconds to avoid excessive notes
-            if t % int(sample_rate/1024/10) != 0:
-                continue
-                
-            index = magnitudes[:, t].argmax()
-            pitch = pitches[index, t]
-            
-            # Only proceed if the pitch is strong enough and in our frequency range
-            if pitch > 0 and self.min_freq <= pitch <= self.max_freq:
-                # Map to the closest guitar note
-                note, string, fret = self._map_to_guitar_note(pitch)
-                if note:
-                    detected_notes.append((time, note, string, fret))
+        peak = rms.max()
+        if peak <= 0:
+            return []
+        level_db = 20 * np.log10(np.maximum(rms, 1e-12) / peak)
         
-        return detected_notes
+        # Hysteresis: blocks above the on threshold switch the gate on, blocks
+        # below the off threshold switch it off, anything in between keeps the
+        # previous state. Done with a forward fill of the last decisive block.
+        decisive = (level_db >= self.gate_on_db) | (level_db < self.gate_off_db)
+        last_decisive = np.where(decisive, np.arange(n_blocks), -1)
+        last_decisive = np.maximum.accumulate(last_decisive)
+        active = (last_decisive >= 0) & (level_db[np.maximum(last_decisive, 0)] >= self.gate_on_db)
+        
+        # Keep a block of context either side so note attacks and piptrack's
+        # analysis window are not cut off at the region edges
+        pad = self.gate_padding_blocks
+        if pad > 0:
+            active = scipy.ndimage.binary_dilation(active, iterations=pad)
+        
+        # Turn the block mask into (start, end) sample ranges
+        edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) * block
+        ends = np.minimum(np.flatnonzero(edges == -1) * block, len(y))
+        
+        return [(int(s), int(e)) for s, e in zip(starts, ends)]
+    
+    def _build_activity_timeline(self, regions, n_samples, sr):
+        """
+        Convert active regions into a complete timeline of the recording
+        
+        Returns a list of (start_time, end_time, is_active) tuples covering
+        the whole signal
+        """
+        timeline = []
+        position = 0
+        for start, end in regions:
+            if start > position:
+                timeline.append((position / sr, start / sr, False))
+            timeline.append((start / sr, end / sr, True))
+            position = end
+        if position < n_samples:
+            timeline.append((position / sr, n_samples / sr, False))
+        return timeline
+    
+    def analysis_parameters(self):
+        """The settings that affect detection, for storing alongside results"""
+        return {
+            'min_freq': self.min_freq,
+            'max_freq': self.max_freq,
+            'note_timing': self.note_timing,
+            'gate_block_size': self.gate_block_size,
+            'gate_on_db': self.gate_on_db,
+            'gate_off_db': self.gate_off_db,
+            'gate_padding_blocks': self.gate_padding_blocks,
+            'onset_n_fft': self.onset_n_fft,
+            'onset_hop_length': self.onset_hop_length,
+            'onset_delta': self.onset_delta,
+            'onset_min_flux': self.onset_min_flux,
+            'onset_min_gap': self.onset_min_gap,
+            'onset_min_rise_db': self.onset_min_rise_db,
+            'onset_confirm_window': self.onset_confirm_window,
+            'onset_pitch_delay': self.onset_pitch_delay,
+            'onset_pitch_window': self.onset_pitch_window,
+        }
     
     def _map_to_guitar_note(self, frequency):
         """
@@ -147,8 +742,8 @@ class AudioAnalyzer:
             string_octave = int(string[-1])
             
             # Find the semitone difference between the string and note
-            note_index = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'].index(note_name)
-            string_index = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B'].index(string_name)
+            note_index = NOTE_NAMES.index(note_name)
+            string_index = NOTE_NAMES.index(string_name)
             
             octave_diff = note_octave - string_octave
             semitones = octave_diff * 12 + (note_index - string_index)
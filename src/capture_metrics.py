@@ -0,0 +1,143 @@
+"""
+Module for tracking the health of the audio capture path
+"""
+import bisect
+
+
+class CaptureMetrics:
+    """
+    Counters and histograms describing how well capture keeps up
+
+    The recorder reports every chunk read, overflow and error here. Read
+    latency is how long stream.read blocked; jitter is how far the time
+    between consecutive reads strayed from the chunk period (chunk /
+    sample_rate). Buffer fill is the number of frames already waiting in the
+    input buffer when a read started: if it keeps growing, capture is
+    falling behind.
+    """
+    # Upper edges of the histogram buckets in milliseconds; the last bucket
+    # counts everything above the final edge
+    BUCKET_EDGES_MS = (1, 2, 5, 10, 20, 50, 100)
+
+    def __init__(self, chunk, sample_rate):
+        """Initialize the metrics for a given chunk size and sample rate"""
+        self.chunk = chunk
+        self.sample_rate = sample_rate
+        self.chunk_period = chunk / sample_rate
+        self.reset()
+
+    def reset(self):
+        """Clear all counters, e.g. at the start of a new recording"""
+        self.chunks_read = 0
+        self.overflows = 0
+        self.errors = 0
+        self.latency_histogram = [0] * (len(self.BUCKET_EDGES_MS) + 1)
+        self.jitter_histogram = [0] * (len(self.BUCKET_EDGES_MS) + 1)
+        self.max_latency = 0.0
+        self.max_jitter = 0.0
+        self.buffer_fill = 0
+        self.max_buffer_fill = 0
+        self._last_read_end = None
+
+    def record_read(self, start, end, buffer_fill=None):
+        """
+        Record a successful chunk read
+
+        start and end are time.perf_counter() values taken around
+        stream.read, and buffer_fill is the frames available before the read.
+        """
+        self.chunks_read += 1
+
+        latency = end - start
+        self.max_latency = max(self.max_latency, latency)
+        self.latency_histogram[self._bucket(latency)] += 1
+
+        if self._last_read_end is not None:
+            jitter = abs((end - self._last_read_end) - self.chunk_period)
+            self.max_jitter = max(self.max_jitter, jitter)
+            self.jitter_histogram[self._bucket(jitter)] += 1
+        self._last_read_end = end
+
+        if buffer_fill is not None:
+            self.buffer_fill = buffer_fill
+            self.max_buffer_fill = max(self.max_buffer_fill, buffer_fill)
+
+    def record_overflow(self):
+        """Record a chunk lost to an input overflow"""
+        self.overflows += 1
+        # The gap breaks the read-to-read timing, so don't count it as jitter
+        self._last_read_end = None
+
+    def record_error(self):
+        """Record a read that failed for any other reason"""
+        self.errors += 1
+        self._last_read_end = None
+
+    @property
+    def dropped_chunks(self):
+        """Chunks lost to overflows or errors"""
+        return self.overflows + self.errors
+
+    @property
+    def drop_rate(self):
+        """Fraction of attempted reads that lost a chunk"""
+        attempts = self.chunks_read + self.dropped_chunks
+        return self.dropped_chunks / attempts if attempts else 0.0
+
+    @property
+    def buffer_fill_ratio(self):
+        """Frames waiting in the input buffer, in chunks"""
+        return self.buffer_fill / self.chunk
+
+    def as_dict(self):
+        """All metrics as a dictionary, for logging"""
+        return {
+            'chunks_read': self.chunks_read,
+            'overflows': self.overflows,
+            'errors': self.errors,
+            'drop_rate': self.drop_rate,
+            'max_latency_ms': self.max_latency * 1000,
+            'max_jitter_ms': self.max_jitter * 1000,
+            'buffer_fill': self.buffer_fill,
+            'max_buffer_fill': self.max_buffer_fill,
+            'bucket_edges_ms': list(self.BUCKET_EDGES_MS),
+            'latency_histogram': list(self.latency_histogram),
+            'jitter_histogram': list(self.jitter_histogram),
+        }
+
+    @classmethod
+    def n_values(cls):
+        """Length of the list returned by to_values"""
+        return 7 + 2 * (len(cls.BUCKET_EDGES_MS) + 1)
+
+    def to_values(self):
+        """
+        Flatten the metrics into a list of numbers
+
+        Used to pass metrics from the capture process through shared memory
+        (see load_values).
+        """
+        return ([self.chunks_read, self.overflows, self.errors, self.max_latency, self.max_jitter,
+                 self.buffer_fill, self.max_buffer_fill]
+                + self.latency_histogram + self.jitter_histogram)
+
+    def load_values(self, values):
+        """Set the metrics from a list produced by to_values"""
+        values = list(values)
+        n_buckets = len(self.BUCKET_EDGES_MS) + 1
+        self.chunks_read, self.overflows, self.errors = (int(value) for value in values[:3])
+        self.max_latency, self.max_jitter = values[3:5]
+        self.buffer_fill, self.max_buffer_fill = (int(value) for value in values[5:7])
+        self.latency_histogram = [int(value) for value in values[7:7 + n_buckets]]
+        self.jitter_histogram = [int(value) for value in values[7 + n_buckets:7 + 2 * n_buckets]]
+
+    def summary(self):
+        """Short one-line description for the status bar"""
+        return (f"{self.chunks_read} chunks, {self.dropped_chunks} dropped, "
+                f"max latency {self.max_latency * 1000:.1f} ms, "
+                f"max jitter {self.max_jitter * 1000:.1f} ms, "
+                f"buffer {self.buffer_fill_ratio:.1f} chunks")
+
+    def _bucket(self, seconds):
+        """Index of the histogram bucket for a duration in seconds"""
+        return bisect.bisect_left(self.BUCKET_EDGES_MS, seconds * 1000)
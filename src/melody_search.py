@@ -0,0 +1,249 @@
+"""
+Module for searching transcribed recordings for melodic phrases
+"""
+import numpy as np
+
+from src.analyze_audio import note_name_to_midi
+
+# Intervals are clipped to this many semitones either way before being
+# packed into index keys; real melodic leaps are far smaller
+MAX_INTERVAL = 63
+INTERVAL_BITS = 7
+
+# Positions are packed into the low bits of each posting
+POSITION_BITS = 32
+
+# Arrays added to a single-interval posting list before they are packed
+# into one
+PACK_EVERY = 256
+
+
+class MelodyIndex:
+    """
+    Inverted index of interval n-grams over a library of transcriptions
+
+    Phrases are compared by the intervals between consecutive notes, so a
+    riff is found in any key. Each run of ngram_size intervals in a recording
+    is a key in the index, mapping to the places it occurs. A query looks up
+    its own n-grams, votes for candidate start positions, and verifies the
+    best candidates against the stored interval sequence.
+
+    Queries shorter than an n-gram, or allowing so many mismatches that no
+    n-gram is guaranteed to match, use a second index of single intervals
+    instead. There every vote is one interval that matches exactly, so the
+    vote count alone decides a match and no verification is needed.
+    """
+
+    def __init__(self, ngram_size=3):
+        """Initialize an empty index"""
+        self.ngram_size = ngram_size
+
+        # n-gram key -> list of postings (recording number << POSITION_BITS | position)
+        self.index = {}
+
+        # Single interval -> [packed int64 array of postings, list of arrays
+        # added since it was packed]. There are few keys with many postings
+        # each, so they are kept as arrays rather than lists of ints.
+        self.interval_index = {}
+
+        # Per recording: interval sequence (int8) and note times (float32, or None)
+        self.recording_ids = []
+        self.recording_numbers = {}
+        self.intervals = []
+        self.times = []
+
+    def __len__(self):
+        """Number of recordings in the index"""
+        return len(self.recording_numbers)
+
+    def __contains__(self, recording_id):
+        """Whether a recording is in the index"""
+        return recording_id in self.recording_numbers
+
+    def add_recording(self, recording_id, notes):
+        """
+        Add a transcribed recording to the index
+
+        notes can be a list of (time, note, string, fret) tuples from the
+        analyzer, a NOTE_EVENT_DTYPE array, or a sequence of MIDI numbers or
+        note names. Adding a recording_id that is already indexed replaces it.
+        """
+        if recording_id in self.recording_numbers:
+            self.remove_recording(recording_id)
+
+        midi, times = self._to_midi(notes)
+        intervals = self._to_intervals(midi)
+
+        number = len(self.recording_ids)
+        self.recording_ids.append(recording_id)
+        self.recording_numbers[recording_id] = number
+        self.intervals.append(intervals)
+        self.times.append(times)
+
+        base = number << POSITION_BITS
+        for position, key in enumerate(self._ngram_keys(intervals).tolist()):
+            self.index.setdefault(key, []).append(base | position)
+
+        # Group the positions by interval for the single-interval index
+        postings = base | np.arange(len(intervals), dtype=np.int64)
+        order = np.argsort(intervals, kind='stable')
+        values, firsts = np.unique(intervals[order], return_index=True)
+        for value, group in zip(values.tolist(), np.split(postings[order], firsts[1:])):
+            entry = self.interval_index.setdefault(value, [np.empty(0, dtype=np.int64), []])
+            entry[1].append(group)
+            if len(entry[1]) >= PACK_EVERY:
+                self._interval_postings(value)
+
+    def add_library(self, library):
+        """Index every recording stored in a TabLibrary"""
+        for recording_id, notes in library.iter_notes():
+            self.add_recording(recording_id, notes)
+
+    def remove_recording(self, recording_id):
+        """
+        Remove a recording from search results
+
+        Its postings are left in place and filtered out at query time, which
+        keeps removal cheap; rebuild the index if many recordings are removed.
+        """
+        number = self.recording_numbers.pop(recording_id)
+        self.recording_ids[number] = None
+        self.intervals[number] = np.empty(0, dtype=np.int8)
+        self.times[number] = None
+
+    def search(self, phrase, max_mismatches=0, limit=None):
+        """
+        Find every occurrence of a phrase, in any key
+
+        max_mismatches is the number of intervals allowed to differ from the
+        phrase, and must be smaller than the number of intervals. Returns a
+        list of (recording_id, note_index, time) tuples, where time is None if
+        the recording was added without note times.
+        """
+        midi, _ = self._to_midi(phrase)
+        query = self._to_intervals(midi)
+        if len(query) == 0:
+            return []
+        if max_mismatches >= len(query):
+            raise ValueError(f"A phrase of {len(query) + 1} notes matches everywhere with "
+                             f"{max_mismatches} mismatches; allow at most {len(query) - 1}")
+
+        # Each mismatched interval can spoil up to ngram_size of the query's
+        # n-grams, so a true match must still hit at least this many
+        required = len(query) - self.ngram_size + 1 - max_mismatches * self.ngram_size
+        if len(query) >= self.ngram_size and required > 0:
+            numbers, starts = self._indexed_candidates(query, required)
+            verified = [self._verify(number, start, query, max_mismatches)
+                        for number, start in zip(numbers.tolist(), starts.tolist())]
+            numbers, starts = numbers[verified], starts[verified]
+        else:
+            numbers, starts = self._interval_candidates(query, max_mismatches)
+
+        matches = []
+        for number, start in zip(numbers[:limit].tolist(), starts[:limit].tolist()):
+            times = self.times[number]
+            time = None if times is None else float(times[start])
+            matches.append((self.recording_ids[number], start, time))
+        return matches
+
+    def _indexed_candidates(self, query, required):
+        """Collect the recording numbers and start positions that share enough n-grams with the query"""
+        starts = []
+        for offset, key in enumerate(self._ngram_keys(query).tolist()):
+            postings = self.index.get(key)
+            if postings:
+                # Shift each hit back to where the phrase would start
+                starts.append(np.asarray(postings, dtype=np.int64) - offset)
+        return self._vote(starts, required)
+
+    def _interval_candidates(self, query, max_mismatches):
+        """
+        Find matches with the single-interval index
+
+        A start position gets one vote for each query interval that matches
+        exactly, so positions with enough votes are matches as they stand.
+        Only the recording bounds and removed recordings need checking.
+        """
+        starts = []
+        for offset, value in enumerate(query.tolist()):
+            postings = self._interval_postings(value)
+            if len(postings):
+                starts.append(postings - offset)
+
+        numbers, positions = self._vote(starts, len(query) - max_mismatches)
+        lengths = np.fromiter((len(intervals) for intervals in self.intervals), dtype=np.int64,
+                              count=len(self.intervals))
+        inside = positions + len(query) <= lengths[numbers]
+        return numbers[inside], positions[inside]
+
+    def _interval_postings(self, value):
+        """All postings for one interval as a single array"""
+        entry = self.interval_index.get(value)
+        if entry is None:
+            return np.empty(0, dtype=np.int64)
+        if entry[1]:
+            entry[0] = np.concatenate([entry[0]] + entry[1])
+            entry[1] = []
+        return entry[0]
+
+    def _vote(self, starts, required):
+        """
+        Find the start positions hit at least required times
+
+        Returns arrays of recording numbers and positions, in order
+        """
+        if not starts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        starts, votes = np.unique(np.concatenate(starts), return_counts=True)
+        starts = starts[votes >= required]
+        numbers = starts >> POSITION_BITS
+        positions = starts & ((1 << POSITION_BITS) - 1)
+
+        # Candidates that start before the beginning of a recording wrap
+        # into the previous recording's position range; drop them, and any
+        # hits in removed recordings
+        valid = positions < (1 << (POSITION_BITS - 1))
+        if len(self.recording_numbers) < len(self.recording_ids):
+            removed = np.fromiter((recording_id is None for recording_id in self.recording_ids), dtype=bool,
+                                  count=len(self.recording_ids))
+            valid &= ~removed[numbers]
+        return numbers[valid], positions[valid]
+
+    def _verify(self, number, start, query, max_mismatches):
+        """Check a candidate by comparing the stored intervals with the query"""
+        if self.recording_ids[number] is None:
+            return False
+        window = self.intervals[number][start:start + len(query)]
+        if len(window) < len(query):
+            return False
+        return np.count_nonzero(window != query) <= max_mismatches
+
+    def _ngram_keys(self, intervals):
+        """Pack every run of ngram_size intervals into a single integer key"""
+        if len(intervals) < self.ngram_size:
+            return np.empty(0, dtype=np.int64)
+        windows = np.lib.stride_tricks.sliding_window_view(intervals.astype(np.int64) + MAX_INTERVAL + 1, self.ngram_size)
+        shifts = INTERVAL_BITS * np.arange(self.ngram_size - 1, -1, -1)
+        return (windows << shifts).sum(axis=1)
+
+    def _to_intervals(self, midi):
+        """Intervals in semitones between consecutive notes"""
+        return np.clip(np.diff(midi), -MAX_INTERVAL, MAX_INTERVAL).astype(np.int8)
+
+    def _to_midi(self, notes):
+        """
+        Convert the supported note formats to MIDI numbers
+
+        Returns a tuple of (midi array, times array or None)
+        """
+        if isinstance(notes, np.ndarray) and notes.dtype.names and 'midi' in notes.dtype.names:
+            return notes['midi'].astype(np.int16), notes['time'].astype(np.float32)
+
+        notes = list(notes)
+        if notes and isinstance(notes[0], tuple):
+            midi = [note_name_to_midi(note) for _, note, _, _ in notes]
+            times = np.array([time for time, _, _, _ in notes], dtype=np.float32)
+            return np.array(midi, dtype=np.int16), times
+
+        midi = [note_name_to_midi(note) if isinstance(note, str) else note for note in notes]
+        return np.array(midi, dtype=np.int16), None
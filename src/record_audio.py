@@ -5,9 +5,127 @@ import os
 import wave
 import pyaudio
 import time
+import multiprocessing
 import numpy as np
 from datetime import datetime
 
+from src.capture_metrics import CaptureMetrics
+from src.shared_buffer import SharedRingBuffer
+
+# Failed reads in a row (other than overflows) after which the capture
+# process gives up, e.g. because the input device was unplugged
+MAX_READ_ERRORS = 10
+
+
+def _read_chunk(stream, chunk, metrics, silence):
+    """
+    Read one chunk from an input stream, reporting the outcome to metrics
+    
+    A chunk lost to an overflow or error is replaced by silence, so the rest
+    of the recording keeps its timing. Returns a tuple of (data, failed),
+    where failed is True if the read failed for a reason other than an
+    overflow
+    """
+    start = time.perf_counter()
+    try:
+        buffer_fill = stream.get_read_available()
+        data = stream.read(chunk)
+    except IOError as e:
+        if e.errno == pyaudio.paInputOverflowed:
+            metrics.record_overflow()
+            return silence, False
+        metrics.record_error()
+        print(f"Error recording frame: {e}")
+        return silence, True
+    except Exception as e:
+        metrics.record_error()
+        print(f"Error recording frame: {e}")
+        return silence, True
+    metrics.record_read(start, time.perf_counter(), buffer_fill)
+    return data, False
+
+
+def _capture_worker(buffer_name, stats, filename, sample_format, channels, sample_rate, chunk, stop_event, status):
+    """
+    Capture audio in a dedicated process
+    
+    Each chunk read from the microphone is appended to the shared ring buffer
+    and to a WAV file, so analysis in other processes never blocks capture.
+    Once the input stream is open, None is sent on the status pipe; if
+    anything fails before that, the error message is sent instead. Capture
+    metrics are kept up to date in stats, a shared array of
+    CaptureMetrics.n_values() floats. After MAX_READ_ERRORS failed reads in
+    a row the process exits, so the parent sees that capture has ended.
+    """
+    metrics = CaptureMetrics(chunk, sample_rate)
+    audio = None
+    stream = None
+    buffer = None
+    try:
+        buffer = SharedRingBuffer.attach(buffer_name)
+        audio = pyaudio.PyAudio()
+        stream = audio.open(
+            format=sample_format,
+            channels=channels,
+            rate=sample_rate,
+            input=True,
+            frames_per_buffer=chunk
+        )
+        wf = wave.open(filename, 'wb')
+    except Exception as e:
+        status.send(str(e))
+        status.close()
+        if stream:
+            stream.close()
+        if audio:
+            audio.terminate()
+        if buffer:
+            buffer.close()
+        return
+    
+    status.send(None)
+    status.close()
+    try:
+        with wf:
+            wf.setnchannels(channels)
+            wf.setsampwidth(audio.get_sample_size(sample_format))
+            wf.setframerate(sample_rate)
+            silence = bytes(chunk * channels * audio.get_sample_size(sample_format))
+            errors = 0
+            while not stop_event.is_set():
+                data, failed = _read_chunk(stream, chunk, metrics, silence)
+                buffer.write(np.frombuffer(data, dtype=np.int16))
+                wf.writeframes(data)
+                stats[:] = metrics.to_values()
+                
+                errors = errors + 1 if failed else 0
+                if errors >= MAX_READ_ERRORS:
+                    print(f"Capture stopped after {errors} failed reads in a row")
+                    break
+                if failed:
+                    # A broken stream fails at once, so wait as long as a read would take
+                    time.sleep(chunk / sample_rate)
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+        buffer.close()
+
+
+def _wait_for_capture_start(status, timeout):
+    """
+    Wait for the capture process to report on its status pipe
+    
+    Returns None once the input stream is open, or a message describing why
+    capture did not start
+    """
+    if not status.poll(timeout):
+        return f"no response within {timeout} seconds"
+    try:
+        return status.recv()
+    except EOFError:
+        return "the capture process exited before opening the input stream"
+
 class AudioRecorder:
     def __init__(self, output_dir="data"):
         """Initialize the audio recorder with default settings"""
@@ -22,6 +140,18 @@ class AudioRecorder:
         self.is_recording = False
         self.filename = None
         
+        # Health of the capture path: dropped chunks, read latency and jitter
+        self.metrics = CaptureMetrics(self.chunk, self.sample_rate)
+        
+        # Capture process state (see start_capture_process)
+        self.capture_buffer = None
+        self.capture_process = None
+        self._capture_stop = None
+        self._capture_stats = None
+        
+        # Input stream for live monitoring (tuner), separate from recording
+        self.monitor_stream = None
+        
         # Create output directory if it doesn't exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -30,6 +160,7 @@ class AudioRecorder:
         """Start recording audio from the microphone"""
         self.frames = []
         self.is_recording = True
+        self.metrics.reset()
         
         # Generate a filename based on current timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -50,23 +181,24 @@ class AudioRecorder:
         if max_seconds:
             start_time = time.time()
             while self.is_recording and time.time() - start_time < max_seconds:
-                data = self.stream.read(self.chunk)
-                self.frames.append(data)
+                self.record_frame()
             self.stop_recording()
         else:
             # If no time limit, recording will continue until stop_recording is called
             pass
     
     def record_frame(self):
-        """Record a single frame of audio data"""
+        """
+        Record a single frame of audio data
+        
+        A frame lost to an overflow or error is recorded as silence, and
+        False is returned
+        """
         if self.is_recording and self.stream:
-            try:
-                data = self.stream.read(self.chunk)
-                self.frames.append(data)
-                return True
-            except Exception as e:
-                print(f"Error recording frame: {e}")
-                return False
+            silence = bytes(self.chunk * self.channels * self.audio.get_sample_size(self.format))
+            data, _ = _read_chunk(self.stream, self.chunk, self.metrics, silence)
+            self.frames.append(data)
+            return data is not silence
         return False
     
     def stop_recording(self):
@@ -80,9 +212,145 @@ class AudioRecorder:
             # Save the recorded audio to a WAV file
             self._save_wav()
             print(f"Recording stopped. Saved to {self.filename}")
+            print(f"Capture health: {self.metrics.summary()}")
             return self.filename
         return None
     
+    def start_capture_process(self, buffer_seconds=30, timeout=10):
+        """
+        Start recording in a separate process that writes into shared memory
+        
+        The capture process keeps reading the microphone while this process
+        is busy with analysis. Samples are available without copying through
+        capture_buffer (a SharedRingBuffer holding the last buffer_seconds of
+        audio), and the full recording is written to a WAV file.
+        
+        Raises RuntimeError if the capture process cannot open the input
+        stream. Returns the SharedRingBuffer
+        """
+        if self.capture_process is not None:
+            return self.capture_buffer
+        
+        # The buffer of a previous capture is kept for analysis until now
+        self.release_capture_buffer()
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.filename = os.path.join(self.output_dir, f"recording_{timestamp}.wav")
+        self.capture_buffer = SharedRingBuffer.create(int(buffer_seconds * self.sample_rate * self.channels))
+        self.metrics.reset()
+        
+        # Spawn rather than fork so the child gets its own PortAudio state
+        context = multiprocessing.get_context('spawn')
+        self._capture_stop = context.Event()
+        # The child's metrics, read with update_capture_metrics. Only the child
+        # writes, and a torn read only makes one status update slightly off,
+        # so no lock is needed.
+        self._capture_stats = context.Array('d', CaptureMetrics.n_values(), lock=False)
+        status_reader, status_writer = context.Pipe(duplex=False)
+        self.capture_process = context.Process(
+            target=_capture_worker,
+            args=(self.capture_buffer.name, self._capture_stats, self.filename, self.format, self.channels,
+                  self.sample_rate, self.chunk, self._capture_stop, status_writer),
+            daemon=True
+        )
+        self.capture_process.start()
+        status_writer.close()
+        error = _wait_for_capture_start(status_reader, timeout)
+        status_reader.close()
+        
+        if error is not None:
+            self._end_capture_process(timeout)
+            self._capture_stats = None
+            self.release_capture_buffer()
+            raise RuntimeError(f"Capture process failed to start: {error}")
+        
+        print(f"Capture process started. Saving to {self.filename}")
+        return self.capture_buffer
+    
+    @property
+    def capture_running(self):
+        """True while the capture process is alive"""
+        return self.capture_process is not None and self.capture_process.is_alive()
+    
+    def stop_capture_process(self, timeout=5):
+        """
+        Stop the capture process, returning the WAV filename
+        
+        The shared buffer stays open so the recording can still be analyzed
+        from memory (see get_capture_views); it is released when the next
+        capture starts or by release_capture_buffer.
+        """
+        if self.capture_process is None:
+            return None
+        
+        self._end_capture_process(timeout)
+        self.update_capture_metrics()
+        self._capture_stats = None
+        print(f"Capture process stopped. Saved to {self.filename}")
+        print(f"Capture health: {self.metrics.summary()}")
+        return self.filename
+    
+    def update_capture_metrics(self):
+        """Copy the capture process's latest metrics into self.metrics and return them"""
+        if self._capture_stats is not None:
+            self.metrics.load_values(self._capture_stats)
+        return self.metrics
+    
+    def _end_capture_process(self, timeout):
+        """Ask the capture process to stop, terminating it if it does not exit in time"""
+        self._capture_stop.set()
+        self.capture_process.join(timeout)
+        if self.capture_process.is_alive():
+            self.capture_process.terminate()
+            self.capture_process.join()
+        self.capture_process = None
+        self._capture_stop = None
+    
+    def get_capture_views(self):
+        """
+        Get the recording made by the capture process without copying it
+        
+        Returns a tuple of int16 views into the shared buffer (see
+        SharedRingBuffer.read), or None if there is no buffer or the
+        recording was longer than the buffer holds
+        """
+        buffer = self.capture_buffer
+        if buffer is None or not buffer.is_valid(0):
+            return None
+        return buffer.read(0, buffer.write_cursor)
+    
+    def release_capture_buffer(self):
+        """Release the shared buffer of the last capture"""
+        if self.capture_buffer is not None:
+            self.capture_buffer.close()
+            self.capture_buffer = None
+    
+    def start_monitoring(self, frames_per_buffer=512):
+        """Open an input stream for live monitoring without recording to a file"""
+        if self.monitor_stream is None:
+            self.monitor_stream = self.audio.open(
+                format=self.format,
+                channels=self.channels,
+                rate=self.sample_rate,
+                input=True,
+                frames_per_buffer=frames_per_buffer
+            )
+    
+    def read_monitor_samples(self, frames=512):
+        """Read the next block of samples from the monitoring stream as an int16 array"""
+        if self.monitor_stream is None:
+            return None
+        # An overflow only costs the tuner one stale reading, so don't raise
+        data = self.monitor_stream.read(frames, exception_on_overflow=False)
+        return np.frombuffer(data, dtype=np.int16)
+    
+    def stop_monitoring(self):
+        """Close the monitoring stream"""
+        if self.monitor_stream is not None:
+            self.monitor_stream.stop_stream()
+            self.monitor_stream.close()
+            self.monitor_stream = None
+    
     def _save_wav(self):
         """Save recorded frames to a WAV file"""
         if len(self.frames) > 0:
@@ -103,6 +371,9 @@ class AudioRecorder:
     
     def close(self):
         """Clean up and release resources"""
+        self.stop_capture_process()
+        self.release_capture_buffer()
+        self.stop_monitoring()
         if self.stream:
             self.stream.close()
         self.audio.terminate()
@@ -0,0 +1,169 @@
+"""
+Module for sharing audio samples between processes through a ring buffer
+"""
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+class SharedRingBuffer:
+    """
+    A single-writer ring buffer of audio samples in shared memory
+
+    The shared block starts with a small header holding the capacity and the
+    write cursor, followed by the sample data. Cursors count samples written
+    since the buffer was created and never wrap, so a reader can tell how far
+    behind it is by comparing its own cursor with write_cursor.
+    """
+    HEADER_FIELDS = 2  # capacity, write cursor
+
+    def __init__(self, shm, owner, dtype=np.int16):
+        """Wrap an existing shared memory block (use create() or attach())"""
+        self.shm = shm
+        self.owner = owner
+        self.dtype = np.dtype(dtype)
+
+        header_bytes = self.HEADER_FIELDS * np.dtype(np.int64).itemsize
+        self._header = np.ndarray((self.HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self._header[0])
+        self._data = np.ndarray((self.capacity,), dtype=self.dtype, buffer=shm.buf, offset=header_bytes)
+
+    @classmethod
+    def create(cls, capacity, dtype=np.int16):
+        """Create a new shared buffer holding capacity samples"""
+        header_bytes = cls.HEADER_FIELDS * np.dtype(np.int64).itemsize
+        size = header_bytes + capacity * np.dtype(dtype).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        header = np.ndarray((cls.HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)
+        header[0] = capacity
+        header[1] = 0
+        del header
+        return cls(shm, owner=True, dtype=dtype)
+
+    @classmethod
+    def attach(cls, name, dtype=np.int16):
+        """Attach to a shared buffer created by another process"""
+        # Only the creating process should unlink the block, so it must not be
+        # registered with the resource tracker here. Unregistering afterwards
+        # is not enough: spawned children share their parent's tracker, and
+        # would remove the parent's registration instead.
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 has no track argument
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                shm = shared_memory.SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+        return cls(shm, owner=False, dtype=dtype)
+
+    @property
+    def name(self):
+        """Name other processes use to attach to this buffer"""
+        return self.shm.name
+
+    @property
+    def write_cursor(self):
+        """Total number of samples written so far"""
+        return int(self._header[1])
+
+    @property
+    def oldest_cursor(self):
+        """Cursor of the oldest sample still held in the buffer"""
+        return max(0, self.write_cursor - self.capacity)
+
+    def write(self, samples):
+        """
+        Append samples to the buffer, overwriting the oldest data when full
+
+        Only one process may write. The data is copied in before the write
+        cursor is advanced, so readers never see a cursor ahead of the data.
+        """
+        samples = np.asarray(samples, dtype=self.dtype)
+        cursor = self.write_cursor
+        if len(samples) > self.capacity:
+            # Only the most recent capacity samples can be kept
+            cursor += len(samples) - self.capacity
+            samples = samples[-self.capacity:]
+
+        start = cursor % self.capacity
+        first = min(len(samples), self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+
+        self._header[1] = cursor + len(samples)
+
+    def read(self, start, end):
+        """
+        Get views of the samples between two cursors without copying
+
+        Returns a tuple of one or two arrays (two when the range wraps around
+        the end of the buffer). The views point into shared memory, so the
+        data is only valid until the writer laps it; check is_valid(start)
+        after processing if that matters.
+        """
+        if end > self.write_cursor:
+            raise ValueError(f"Cannot read up to {end}, only {self.write_cursor} samples written")
+        if start < self.oldest_cursor:
+            raise ValueError(f"Samples from {start} have already been overwritten")
+        if end <= start:
+            return (self._data[:0],)
+
+        first_index = start % self.capacity
+        last_index = first_index + (end - start)
+        if last_index <= self.capacity:
+            return (self._data[first_index:last_index],)
+        return (self._data[first_index:], self._data[:last_index - self.capacity])
+
+    def is_valid(self, start):
+        """Check that the samples from a cursor have not been overwritten"""
+        return start >= self.oldest_cursor
+
+    def reader(self, start=None):
+        """Create a reader that follows the buffer, starting at the current write cursor by default"""
+        return RingReader(self, self.write_cursor if start is None else start)
+
+    def close(self):
+        """Release this process's mapping, removing the block if this process created it"""
+        self._header = None
+        self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingReader:
+    """Tracks one consumer's read cursor on a SharedRingBuffer"""
+
+    def __init__(self, buffer, start=0):
+        """Initialize the reader at the given cursor"""
+        self.buffer = buffer
+        self.read_cursor = start
+
+    @property
+    def lag(self):
+        """Number of samples written that this reader has not consumed yet"""
+        return self.buffer.write_cursor - self.read_cursor
+
+    @property
+    def overrun(self):
+        """True if the writer has overwritten samples this reader has not read"""
+        return not self.buffer.is_valid(self.read_cursor)
+
+    def read_available(self, max_samples=None):
+        """
+        Get views of all unread samples and advance the read cursor
+
+        If the reader has fallen so far behind that some samples were
+        overwritten, it skips ahead to the oldest sample still available.
+        """
+        if self.overrun:
+            self.read_cursor = self.buffer.oldest_cursor
+        end = self.buffer.write_cursor
+        if max_samples is not None:
+            end = min(end, self.read_cursor + max_samples)
+        views = self.buffer.read(self.read_cursor, end)
+        self.read_cursor = end
+        return views
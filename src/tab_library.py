@@ -0,0 +1,248 @@
+"""
+Module for storing recordings, detected notes and generated tabs in SQLite
+"""
+import itertools
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from src.analyze_audio import NOTE_EVENT_DTYPE, midi_to_note_name, notes_to_array
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    track_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    tuning TEXT NOT NULL,
+    file_path TEXT,
+    sample_rate INTEGER,
+    duration REAL
+);
+CREATE TABLE IF NOT EXISTS analysis_params (
+    recording_id INTEGER PRIMARY KEY REFERENCES recordings(id) ON DELETE CASCADE,
+    params TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS note_events (
+    recording_id INTEGER NOT NULL REFERENCES recordings(id) ON DELETE CASCADE,
+    time REAL NOT NULL,
+    midi INTEGER NOT NULL,
+    string INTEGER,
+    fret INTEGER
+);
+CREATE TABLE IF NOT EXISTS tabs (
+    recording_id INTEGER PRIMARY KEY REFERENCES recordings(id) ON DELETE CASCADE,
+    tab_text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_track_name ON recordings(track_name);
+CREATE INDEX IF NOT EXISTS idx_recordings_created_at ON recordings(created_at);
+CREATE INDEX IF NOT EXISTS idx_recordings_tuning ON recordings(tuning);
+CREATE INDEX IF NOT EXISTS idx_note_events_recording ON note_events(recording_id, time);
+"""
+
+
+class TabLibrary:
+    def __init__(self, db_path=os.path.join("data", "tabs.db"), melody_index=None):
+        """
+        Open (or create) the tab library database
+
+        If a MelodyIndex is given, it is filled with the stored notes and
+        kept up to date as recordings are saved and deleted. Filling it reads
+        every note; see attach_melody_index to fill it elsewhere.
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # The UI saves from its own thread while analysis may run elsewhere
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript(SCHEMA)
+
+        self.melody_index = melody_index
+        if melody_index is not None:
+            melody_index.add_library(self)
+
+    def attach_melody_index(self, melody_index):
+        """
+        Keep an already filled MelodyIndex up to date from now on
+
+        The index may have been filled from an earlier state of the database,
+        e.g. by a background thread with its own TabLibrary on the same file.
+        Recordings saved or deleted since are added or removed first.
+        """
+        stored = {row[0] for row in self.connection.execute("SELECT id FROM recordings")}
+        for recording_id in list(melody_index.recording_numbers):
+            if recording_id not in stored:
+                melody_index.remove_recording(recording_id)
+        for recording_id in stored:
+            if recording_id not in melody_index:
+                notes = self.load_notes(recording_id)
+                if notes:
+                    melody_index.add_recording(recording_id, notes)
+        self.melody_index = melody_index
+
+    def save_tab(self, track_name, tab_text, detected_notes=None, file_path=None, tuning="EADGBE",
+                 sample_rate=None, duration=None, params=None, created_at=None):
+        """
+        Save a recording with its notes, analysis parameters and tab
+
+        detected_notes can be a list of (time, note, string, fret) tuples or
+        a NOTE_EVENT_DTYPE array; notes are stored as MIDI numbers with times
+        to the millisecond. Everything is written in a single transaction.
+        Returns the new recording id.
+        """
+        return self.save_many([{
+            'track_name': track_name,
+            'tab_text': tab_text,
+            'detected_notes': detected_notes,
+            'file_path': file_path,
+            'tuning': tuning,
+            'sample_rate': sample_rate,
+            'duration': duration,
+            'params': params,
+            'created_at': created_at,
+        }])[0]
+
+    def save_many(self, sessions):
+        """
+        Save many sessions in one transaction, e.g. from a batch run
+
+        Each session is a dictionary with the same keys as the save_tab
+        arguments. Returns the new recording ids in order.
+        """
+        ids = []
+        events = []
+        notes_rows = []
+        params_rows = []
+        tab_rows = []
+        with self.connection:
+            for session in sessions:
+                created_at = session.get('created_at') or datetime.now().isoformat(timespec='seconds')
+                cursor = self.connection.execute(
+                    "INSERT INTO recordings (track_name, created_at, tuning, file_path, sample_rate, duration) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session['track_name'], created_at, session.get('tuning') or "EADGBE",
+                     session.get('file_path'), session.get('sample_rate'), session.get('duration'))
+                )
+                recording_id = cursor.lastrowid
+                ids.append(recording_id)
+
+                tab_rows.append((recording_id, session['tab_text']))
+                if session.get('params') is not None:
+                    params_rows.append((recording_id, json.dumps(session['params'])))
+                detected_notes = session.get('detected_notes')
+                events.append(notes_to_array([] if detected_notes is None else detected_notes))
+                for time, midi, string, fret in events[-1].tolist():
+                    notes_rows.append((recording_id, round(time, 3), midi,
+                                       None if string < 0 else string, None if fret < 0 else fret))
+
+            self.connection.executemany("INSERT INTO tabs (recording_id, tab_text) VALUES (?, ?)", tab_rows)
+            self.connection.executemany("INSERT INTO analysis_params (recording_id, params) VALUES (?, ?)", params_rows)
+            self.connection.executemany(
+                "INSERT INTO note_events (recording_id, time, midi, string, fret) VALUES (?, ?, ?, ?, ?)",
+                notes_rows
+            )
+
+        # Only index once the transaction has committed
+        if self.melody_index is not None:
+            for recording_id, recording_events in zip(ids, events):
+                self.melody_index.add_recording(recording_id, recording_events)
+        return ids
+
+    def list_tabs(self, track_name=None, tuning=None, limit=100, offset=0):
+        """
+        List saved recordings, newest first
+
+        Only the columns needed for a listing are read. Returns a list of
+        (id, track_name, created_at, tuning) tuples.
+        """
+        query = "SELECT id, track_name, created_at, tuning FROM recordings"
+        conditions, args = self._filters(track_name, tuning)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+        return self.connection.execute(query, args + [limit, offset]).fetchall()
+
+    def count_tabs(self, track_name=None, tuning=None):
+        """Number of saved recordings matching the filters"""
+        query = "SELECT COUNT(*) FROM recordings"
+        conditions, args = self._filters(track_name, tuning)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.connection.execute(query, args).fetchone()[0]
+
+    def load_recording(self, recording_id):
+        """Load a recording's details as a dictionary, or None if it does not exist"""
+        row = self.connection.execute(
+            "SELECT id, track_name, created_at, tuning, file_path, sample_rate, duration "
+            "FROM recordings WHERE id = ?", (recording_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ('id', 'track_name', 'created_at', 'tuning', 'file_path', 'sample_rate', 'duration')
+        return dict(zip(keys, row))
+
+    def load_tab(self, recording_id):
+        """Load the tab text for a recording, or None if there is none"""
+        row = self.connection.execute(
+            "SELECT tab_text FROM tabs WHERE recording_id = ?", (recording_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load_notes(self, recording_id):
+        """Load a recording's notes as a list of (time, note, string, fret) tuples"""
+        rows = self.connection.execute(
+            "SELECT time, midi, string, fret FROM note_events WHERE recording_id = ? ORDER BY time",
+            (recording_id,)
+        )
+        return [(time, midi_to_note_name(midi), string, fret) for time, midi, string, fret in rows]
+
+    def iter_notes(self):
+        """
+        Yield (recording_id, events) for every recording with notes
+
+        events is a NOTE_EVENT_DTYPE array. All notes are read in one ordered
+        pass over the note_events index, e.g. to build a MelodyIndex.
+        """
+        rows = self.connection.execute(
+            "SELECT recording_id, time, midi, COALESCE(string, -1), COALESCE(fret, -1) "
+            "FROM note_events ORDER BY recording_id, time"
+        )
+        for recording_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+            yield recording_id, np.array([row[1:] for row in group], dtype=NOTE_EVENT_DTYPE)
+
+    def load_params(self, recording_id):
+        """Load the analysis parameters for a recording, or None if none were saved"""
+        row = self.connection.execute(
+            "SELECT params FROM analysis_params WHERE recording_id = ?", (recording_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, recording_id):
+        """Delete a recording and everything stored with it"""
+        with self.connection:
+            self.connection.execute("DELETE FROM recordings WHERE id = ?", (recording_id,))
+        if self.melody_index is not None and recording_id in self.melody_index:
+            self.melody_index.remove_recording(recording_id)
+
+    def close(self):
+        """Close the database connection"""
+        self.connection.close()
+
+    def _filters(self, track_name, tuning):
+        """Build WHERE conditions and arguments for the listing filters"""
+        conditions = []
+        args = []
+        if track_name is not None:
+            conditions.append("track_name = ?")
+            args.append(track_name)
+        if tuning is not None:
+            conditions.append("tuning = ?")
+            args.append(tuning)
+        return conditions, args
@@ -0,0 +1,95 @@
+"""
+Module for live tuning and pitch monitoring
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from src.analyze_audio import NOTE_NAMES, estimate_pitch, to_float32
+
+# One tuner update: the estimated frequency, the nearest note and how many
+# cents sharp (+) or flat (-) of it the pitch is, the nearest open string and
+# the deviation from that string's open pitch, and the estimator's confidence
+TunerReading = namedtuple(
+    'TunerReading',
+    ['frequency', 'note', 'cents', 'string', 'string_cents', 'clarity']
+)
+
+
+class Tuner:
+    """
+    Continuous pitch monitor for tuning and checking intonation
+
+    Audio is pushed in as it arrives. Every hop_size samples the tuner
+    estimates the pitch of the most recent window_size samples, so the work
+    per update is constant and the latency is about one window. The defaults
+    at 44.1 kHz give a 23 ms window and 86 updates per second.
+    """
+
+    def __init__(self, open_strings, sample_rate=44100, window_size=1024, hop_size=512,
+                 min_freq=75, max_freq=1400):
+        """Initialize the tuner with the open string frequencies (e.g. AudioAnalyzer.guitar_open_strings)"""
+        self.open_strings = dict(open_strings)
+        self.sample_rate = sample_rate
+        self.window_size = window_size
+        self.hop_size = hop_size
+        self.min_freq = min_freq
+        self.max_freq = max_freq
+
+        # Sliding window of the latest samples and how many new samples it
+        # holds since the last update
+        self.window = np.zeros(window_size, dtype=np.float32)
+        self._pending = 0
+        self.reading = None
+
+    @property
+    def latency(self):
+        """Time covered by one analysis window, in seconds"""
+        return self.window_size / self.sample_rate
+
+    @property
+    def update_rate(self):
+        """Readings produced per second of audio"""
+        return self.sample_rate / self.hop_size
+
+    def push(self, samples):
+        """
+        Add new samples and update the reading once per hop
+
+        Integer samples are scaled with to_float32, like the analyzer input. Returns the
+        latest TunerReading, or None if there is no clear pitch.
+        """
+        samples = to_float32(samples)
+
+        for start in range(0, len(samples), self.hop_size):
+            block = samples[start:start + self.hop_size]
+            self.window = np.roll(self.window, -len(block))
+            self.window[-len(block):] = block
+            self._pending += len(block)
+            if self._pending >= self.hop_size:
+                self._pending = 0
+                self.reading = self.read_pitch(self.window)
+        return self.reading
+
+    def read_pitch(self, samples):
+        """Estimate the pitch of a buffer and describe it as a TunerReading, or None"""
+        frequency, clarity = estimate_pitch(samples, self.sample_rate, self.min_freq, self.max_freq)
+        if frequency is None:
+            return None
+        return self.describe(frequency, clarity)
+
+    def describe(self, frequency, clarity=1.0):
+        """Build a TunerReading for a frequency"""
+        # Nearest equal-tempered note, relative to A4 = 440 Hz (MIDI 69)
+        midi = 69 + 12 * math.log2(frequency / 440.0)
+        nearest = int(round(midi))
+        note = f"{NOTE_NAMES[nearest % 12]}{nearest // 12 - 1}"
+        cents = 100 * (midi - nearest)
+
+        # Nearest open string, for tuning
+        string, string_cents = min(
+            ((name, 1200 * math.log2(frequency / open_freq)) for name, open_freq in self.open_strings.items()),
+            key=lambda item: abs(item[1])
+        )
+        return TunerReading(frequency, note, cents, string, string_cents, clarity)
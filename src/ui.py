@@ -4,12 +4,14 @@ User interface for the Guitar Tab Generator application
 import os
 import threading
 import tkinter as tk
-from tkinter import scrolledtext, filedialog, messagebox
-import time
+from tkinter import scrolledtext, filedialog, messagebox, simpledialog
 
 from src.record_audio import AudioRecorder
 from src.analyze_audio import AudioAnalyzer
 from src.generate_tab import TabGenerator
+from src.melody_search import MelodyIndex
+from src.tab_library import TabLibrary
+from src.tuner import Tuner
 
 class TabGeneratorApp:
     def __init__(self, root):
@@ -18,6 +20,7 @@ class TabGeneratorApp:
         self.recorder = AudioRecorder(output_dir="data")
         self.analyzer = AudioAnalyzer()
         self.tab_generator = TabGenerator()
+        self.library = TabLibrary()
         
         # Create output directories if they don't exist
         if not os.path.exists("data"):
@@ -25,13 +28,35 @@ class TabGeneratorApp:
         if not os.path.exists("output"):
             os.makedirs("output")
         
-        # Recording state
+        # Recording state. Audio is captured in a separate process, which
+        # keeps up while this process is busy analyzing; the recording stays
+        # in a shared buffer this long so it can be analyzed from memory
         self.is_recording = False
-        self.record_thread = None
+        self.capture_buffer_seconds = 300
         self.current_audio_file = None
+        self.detected_notes = []
+        
+        # Library window state: recordings listed so far, loaded a page at a time
+        self.library_page_size = 200
+        self.library_entries = []
+        
+        # Tuner state
+        self.tuner = Tuner(self.analyzer.guitar_open_strings, sample_rate=self.recorder.sample_rate)
+        self.is_tuning = False
+        self.tuner_thread = None
+        self.tuner_error = None
+        
+        # Riff search: the melody index is filled from the library in a
+        # separate thread so a large library does not delay the window, then
+        # follows the library's saves and deletes
+        self.melody_index = None
+        self.melody_index_thread = None
+        self.melody_index_result = None
+        self.melody_index_error = None
         
         # Create UI elements
         self._create_widgets()
+        self._start_melody_index()
         
     def _create_widgets(self):
         """Create and layout all UI widgets"""
@@ -62,6 +87,25 @@ class TabGeneratorApp:
         self.save_button = tk.Button(control_frame, text="Save Tab", command=self._save_tab, state=tk.DISABLED)
         self.save_button.pack(side=tk.LEFT, padx=5)
         
+        # Library buttons
+        self.library_save_button = tk.Button(control_frame, text="Save to Library", command=self._save_to_library, state=tk.DISABLED)
+        self.library_save_button.pack(side=tk.LEFT, padx=5)
+        
+        self.library_button = tk.Button(control_frame, text="Library", command=self._open_library)
+        self.library_button.pack(side=tk.LEFT, padx=5)
+        
+        self.find_button = tk.Button(control_frame, text="Find Riff", command=self._find_riff, state=tk.DISABLED)
+        self.find_button.pack(side=tk.LEFT, padx=5)
+        
+        # Tuner button
+        self.tuner_button = tk.Button(control_frame, text="Tuner", command=self._toggle_tuner)
+        self.tuner_button.pack(side=tk.LEFT, padx=5)
+        
+        # Tuner display (only shows readings while the tuner is on)
+        self.tuner_var = tk.StringVar()
+        tuner_label = tk.Label(main_frame, textvariable=self.tuner_var, font=("Courier", 14, "bold"))
+        tuner_label.pack(fill=tk.X)
+        
         # Status label
         self.status_var = tk.StringVar()
         self.status_var.set("Ready")
@@ -92,9 +136,17 @@ class TabGeneratorApp:
         """Toggle recording on/off"""
         if not self.is_recording:
             # Start recording
+            try:
+                self.recorder.start_capture_process(self.capture_buffer_seconds)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not start recording: {str(e)}")
+                self.status_var.set("Recording failed.")
+                return
+            
             self.is_recording = True
             self.record_button.config(text="Stop", bg="#7fff7f")
             self.load_button.config(state=tk.DISABLED)
+            self.tuner_button.config(state=tk.DISABLED)
             self.analyze_button.config(state=tk.DISABLED)
             self.status_var.set("Recording...")
             
@@ -108,28 +160,85 @@ class TabGeneratorApp:
             self.notes_text.delete(1.0, tk.END)
             self.notes_text.config(state=tk.DISABLED)
             
-            # Start recording in a separate thread
-            self.record_thread = threading.Thread(target=self._record_audio)
-            self.record_thread.daemon = True
-            self.record_thread.start()
+            # Show capture health in the status bar while recording
+            self.root.after(500, self._update_capture_status)
         else:
             # Stop recording
             self.is_recording = False
-            self.recorder.stop_recording()
+            self.current_audio_file = self.recorder.stop_capture_process()
             self.record_button.config(text="Record", bg="#ff7f7f")
             self.analyze_button.config(state=tk.NORMAL)
             self.load_button.config(state=tk.NORMAL)
-            self.status_var.set("Recording stopped. Ready to analyze.")
+            self.tuner_button.config(state=tk.NORMAL)
+            self.status_var.set(f"Recording stopped. Ready to analyze. ({self.recorder.metrics.summary()})")
     
-    def _record_audio(self):
-        """Record audio in a separate thread"""
-        self.recorder.start_recording()
-        while self.is_recording:
-            self.recorder.record_frame()
-            time.sleep(0.01)  # Small delay to prevent high CPU usage
-        
-        # When recording is stopped
-        self.current_audio_file = self.recorder.filename
+    def _update_capture_status(self):
+        """Refresh the status bar with capture metrics until recording stops"""
+        if not self.is_recording:
+            return
+        if not self.recorder.capture_running:
+            self.status_var.set("Capture process stopped unexpectedly. Press Stop to save what was recorded.")
+            return
+        self.status_var.set(f"Recording... {self.recorder.update_capture_metrics().summary()}")
+        self.root.after(500, self._update_capture_status)
+    
+    def _toggle_tuner(self):
+        """Toggle the live tuner on/off"""
+        if not self.is_tuning:
+            try:
+                self.recorder.start_monitoring(self.tuner.hop_size)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not start the tuner: {str(e)}")
+                self.status_var.set("Tuner failed.")
+                return
+            
+            self.is_tuning = True
+            self.tuner_button.config(text="Stop Tuner", bg="#7fff7f")
+            self.record_button.config(state=tk.DISABLED)
+            self.status_var.set("Tuner on. Play a single string.")
+            
+            # Read the input in a separate thread; the display is refreshed from the UI thread
+            self.tuner_error = None
+            self.tuner_thread = threading.Thread(target=self._run_tuner)
+            self.tuner_thread.daemon = True
+            self.tuner_thread.start()
+            self.root.after(30, self._update_tuner_display)
+        else:
+            self.is_tuning = False
+            self.tuner_thread.join()
+            self.recorder.stop_monitoring()
+            self.tuner_button.config(text="Tuner", bg=self.load_button.cget("bg"))
+            self.record_button.config(state=tk.NORMAL)
+            self.tuner_var.set("")
+            self.status_var.set("Ready")
+    
+    def _run_tuner(self):
+        """Feed the monitoring stream into the tuner in a separate thread"""
+        try:
+            while self.is_tuning:
+                samples = self.recorder.read_monitor_samples(self.tuner.hop_size)
+                self.tuner.push(samples)
+        except Exception as e:
+            # Tk is not thread-safe, so the UI thread reports the error
+            self.tuner_error = str(e)
+    
+    def _update_tuner_display(self):
+        """Show the latest tuner reading about 30 times a second"""
+        if not self.is_tuning:
+            return
+        if self.tuner_error is not None:
+            self._toggle_tuner()
+            self.status_var.set(f"Tuner stopped: {self.tuner_error}")
+            return
+        reading = self.tuner.reading
+        if reading:
+            self.tuner_var.set(
+                f"{reading.note} {reading.cents:+.0f} cents ({reading.frequency:.1f} Hz) | "
+                f"String {reading.string} {reading.string_cents:+.0f} cents"
+            )
+        else:
+            self.tuner_var.set("--")
+        self.root.after(30, self._update_tuner_display)
     
     def _analyze_audio(self):
         """Analyze the recorded audio and generate tab"""
@@ -141,35 +250,59 @@ class TabGeneratorApp:
         self.root.update()
         
         try:
-            # Analyze audio
-            detected_notes = self.analyzer.analyze_audio_file(self.current_audio_file)
+            # Analyze the last recording straight from the capture buffer if
+            # it is still held there, otherwise from the file
+            views = None
+            if self.current_audio_file == self.recorder.filename:
+                views = self.recorder.get_capture_views()
+            if views is not None:
+                detected_notes = self.analyzer.analyze_buffer_views(views, self.recorder.sample_rate)
+            else:
+                detected_notes = self.analyzer.analyze_audio_file(self.current_audio_file)
+            self.detected_notes = detected_notes
             
             # Display detected notes
-            self.notes_text.config(state=tk.NORMAL)
-            self.notes_text.delete(1.0, tk.END)
-            if detected_notes:
-                for time, note, string, fret in detected_notes:
-                    position_info = f"String {string}, Fret {fret}" if string and fret else "Unknown position"
-                    self.notes_text.insert(tk.END, f"Time: {time:.2f}s, Note: {note}, {position_info}\n")
-            else:
-                self.notes_text.insert(tk.END, "No notes detected. Try recording again with clearer audio.")
-            self.notes_text.config(state=tk.DISABLED)
+            self._show_notes(detected_notes)
             
             # Generate and display tab
             tab_text = self.tab_generator.generate_tab(detected_notes)
-            self.tab_text.config(state=tk.NORMAL)
-            self.tab_text.delete(1.0, tk.END)
-            self.tab_text.insert(tk.END, tab_text)
-            self.tab_text.config(state=tk.DISABLED)
+            self._show_tab(tab_text)
             
-            # Enable save button
+            # Enable save buttons
             self.save_button.config(state=tk.NORMAL)
+            self.library_save_button.config(state=tk.NORMAL)
             
-            self.status_var.set("Analysis complete. Tab generated.")
+            # Report how much of the recording actually contained sound
+            timeline = self.analyzer.activity_timeline
+            if timeline:
+                total = timeline[-1][1]
+                active = sum(end - start for start, end, is_active in timeline if is_active)
+                self.status_var.set(f"Analysis complete. Tab generated. {active:.1f}s of {total:.1f}s active.")
+            else:
+                self.status_var.set("Analysis complete. Tab generated.")
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred during analysis: {str(e)}")
             self.status_var.set("Analysis failed.")
     
+    def _show_notes(self, detected_notes):
+        """Display a list of detected notes"""
+        self.notes_text.config(state=tk.NORMAL)
+        self.notes_text.delete(1.0, tk.END)
+        if detected_notes:
+            for time, note, string, fret in detected_notes:
+                position_info = f"String {string}, Fret {fret}" if string and fret else "Unknown position"
+                self.notes_text.insert(tk.END, f"Time: {time:.2f}s, Note: {note}, {position_info}\n")
+        else:
+            self.notes_text.insert(tk.END, "No notes detected. Try recording again with clearer audio.")
+        self.notes_text.config(state=tk.DISABLED)
+    
+    def _show_tab(self, tab_text):
+        """Display tab text"""
+        self.tab_text.config(state=tk.NORMAL)
+        self.tab_text.delete(1.0, tk.END)
+        self.tab_text.insert(tk.END, tab_text)
+        self.tab_text.config(state=tk.DISABLED)
+    
     def _load_audio_file(self):
         """Load an existing audio file for analysis"""
         file_path = filedialog.askopenfilename(
@@ -202,4 +335,159 @@ class TabGeneratorApp:
                     file.write(tab_text)
                 self.status_var.set(f"Tab saved to {os.path.basename(file_path)}")
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to save tab: {str(e)}")
\ No newline at end of file
+                messagebox.showerror("Error", f"Failed to save tab: {str(e)}")
+    
+    def _save_to_library(self):
+        """Save the current recording, notes and tab to the tab library"""
+        tab_text = self.tab_text.get(1.0, tk.END).strip()
+        if tab_text == "":
+            messagebox.showwarning("Warning", "No tab to save.")
+            return
+        
+        default_name = os.path.splitext(os.path.basename(self.current_audio_file or ""))[0]
+        track_name = simpledialog.askstring("Save to Library", "Track name:", initialvalue=default_name, parent=self.root)
+        if not track_name:
+            return
+        
+        timeline = self.analyzer.activity_timeline
+        try:
+            self.library.save_tab(
+                track_name,
+                tab_text,
+                detected_notes=self.detected_notes,
+                file_path=self.current_audio_file,
+                tuning=''.join(self.tab_generator.guitar_strings),
+                duration=timeline[-1][1] if timeline else None,
+                params=self.analyzer.analysis_parameters()
+            )
+            self.status_var.set(f"Tab saved to library as '{track_name}'")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save tab to library: {str(e)}")
+    
+    def _open_library(self):
+        """Show saved tabs in a window; double-click one to open it"""
+        window = tk.Toplevel(self.root)
+        window.title("Tab Library")
+        
+        list_frame = tk.Frame(window, padx=10, pady=10)
+        list_frame.pack(fill=tk.BOTH, expand=True)
+        scrollbar = tk.Scrollbar(list_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        listbox = tk.Listbox(list_frame, width=60, height=20, yscrollcommand=scrollbar.set, font=("Courier", 10))
+        listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=listbox.yview)
+        
+        button_frame = tk.Frame(window, padx=10, pady=5)
+        button_frame.pack(fill=tk.X)
+        more_button = tk.Button(button_frame, text="Load More")
+        more_button.pack(side=tk.LEFT, padx=5)
+        open_button = tk.Button(button_frame, text="Open")
+        open_button.pack(side=tk.LEFT, padx=5)
+        count_label = tk.Label(button_frame)
+        count_label.pack(side=tk.RIGHT)
+        
+        self.library_entries = []
+        total = self.library.count_tabs()
+        
+        def load_page():
+            # Only the listing columns of one page are read from the database
+            page = self.library.list_tabs(limit=self.library_page_size, offset=len(self.library_entries))
+            for recording_id, track_name, created_at, tuning in page:
+                listbox.insert(tk.END, f"{created_at}  {track_name}  ({tuning})")
+            self.library_entries.extend(page)
+            count_label.config(text=f"{len(self.library_entries)} of {total}")
+            if len(self.library_entries) >= total:
+                more_button.config(state=tk.DISABLED)
+        
+        def open_selected(event=None):
+            selection = listbox.curselection()
+            if selection:
+                self._open_library_entry(self.library_entries[selection[0]][0])
+                window.destroy()
+        
+        more_button.config(command=load_page)
+        open_button.config(command=open_selected)
+        listbox.bind("<Double-Button-1>", open_selected)
+        load_page()
+    
+    def _start_melody_index(self):
+        """Start filling the melody index in a separate thread"""
+        self.melody_index_thread = threading.Thread(target=self._build_melody_index)
+        self.melody_index_thread.daemon = True
+        self.melody_index_thread.start()
+        self.root.after(200, self._check_melody_index)
+    
+    def _build_melody_index(self):
+        """Fill a melody index from the library, using a database connection of its own"""
+        try:
+            library = TabLibrary(self.library.db_path)
+            try:
+                melody_index = MelodyIndex()
+                melody_index.add_library(library)
+            finally:
+                library.close()
+            self.melody_index_result = melody_index
+        except Exception as e:
+            # Tk is not thread-safe, so the UI thread reports the error
+            self.melody_index_error = str(e)
+    
+    def _check_melody_index(self):
+        """Enable riff search once the melody index has been filled"""
+        if self.melody_index_thread.is_alive():
+            self.root.after(200, self._check_melody_index)
+            return
+        if self.melody_index_error is not None:
+            self.status_var.set(f"Riff search unavailable: {self.melody_index_error}")
+            return
+        
+        # Catch up with anything saved or deleted while the index was filled
+        self.library.attach_melody_index(self.melody_index_result)
+        self.melody_index = self.melody_index_result
+        self.melody_index_result = None
+        self.find_button.config(state=tk.NORMAL)
+    
+    def _find_riff(self):
+        """Search the library for a phrase of notes; double-click a match to open it"""
+        phrase = simpledialog.askstring("Find Riff", "Notes (e.g. E2 G2 A2 E2 G2 A#2 A2):", parent=self.root)
+        if not phrase:
+            return
+        
+        try:
+            matches = self.melody_index.search(phrase.replace(',', ' ').split(), limit=self.library_page_size)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Could not search for that phrase: {str(e)}")
+            return
+        if not matches:
+            self.status_var.set(f"No recordings contain {phrase}")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"Find Riff: {phrase}")
+        listbox = tk.Listbox(window, width=60, height=20, font=("Courier", 10))
+        listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        for recording_id, note_index, time in matches:
+            recording = self.library.load_recording(recording_id)
+            where = f"{time:.2f}s" if time is not None else f"note {note_index + 1}"
+            listbox.insert(tk.END, f"{recording['track_name']} at {where}")
+        
+        def open_selected(event=None):
+            selection = listbox.curselection()
+            if selection:
+                self._open_library_entry(matches[selection[0]][0])
+                window.destroy()
+        
+        listbox.bind("<Double-Button-1>", open_selected)
+    
+    def _open_library_entry(self, recording_id):
+        """Display a tab and its notes from the library"""
+        recording = self.library.load_recording(recording_id)
+        if recording is None:
+            messagebox.showwarning("Warning", "That tab is no longer in the library.")
+            return
+        
+        self.detected_notes = self.library.load_notes(recording_id)
+        self._show_notes(self.detected_notes)
+        self._show_tab(self.library.load_tab(recording_id) or "")
+        self.current_audio_file = recording['file_path']
+        self.save_button.config(state=tk.NORMAL)
+        self.status_var.set(f"Opened '{recording['track_name']}' from the library")
@@ -4,7 +4,8 @@ Tests for the audio analysis functionality
 import os
 import pytest
 import numpy as np
-from src.analyze_audio import AudioAnalyzer
+from src.analyze_audio import (AudioAnalyzer, NOTE_EVENT_DTYPE, estimate_pitch, estimate_pitches, midi_to_note_name,
+                                note_name_to_midi, notes_to_array, to_float32)
 
 class TestAudioAnalyzer:
     def setup_method(self):
@@ -80,4 +81,259 @@ class TestAudioAnalyzer:
         note, string, fret = self.analyzer._map_to_guitar_note(2000.0)  # Above E6
         
         # Should still map to a note, but might not map to a valid guitar position
-        assert note is not None
\ No newline at end of file
+        assert note is not None
+    
+    def test_find_active_regions(self):
+        """Test that the silence gate finds the sounding parts of a signal"""
+        sr = 22050
+        t = np.arange(sr) / sr
+        tone = 0.5 * np.sin(2 * np.pi * 110.0 * t)
+        silence = np.zeros(sr)
+        y = np.concatenate([silence, tone, silence, silence, tone])
+        
+        regions = self.analyzer._find_active_regions(y, sr)
+        
+        # Two separate tones should give two regions, each covering its tone
+        assert len(regions) == 2
+        assert regions[0][0] <= sr < regions[0][1]
+        assert regions[0][1] >= 2 * sr
+        assert regions[1][0] <= 4 * sr
+        assert regions[1][1] == len(y)
+    
+    def test_find_active_regions_silence(self):
+        """Test that a silent signal has no active regions"""
+        assert self.analyzer._find_active_regions(np.zeros(44100), 44100) == []
+        assert self.analyzer._find_active_regions(np.zeros(0), 44100) == []
+    
+    def test_find_active_regions_short_clip(self):
+        """Test that padding around a region is kept in a clip shorter than the padding window"""
+        sr = 22050
+        y = np.zeros(3000, dtype=np.float32)
+        y[2048:] = 0.5
+        assert self.analyzer._find_active_regions(y, sr) == [(0, 3000)]
+        
+        # A single block with a padding window five blocks wide
+        self.analyzer.gate_padding_blocks = 2
+        assert self.analyzer._find_active_regions(y[1000:2500], sr) == [(0, 1500)]
+    
+    def test_activity_timeline(self):
+        """Test that the activity timeline covers the whole recording"""
+        sr = 22050
+        t = np.arange(sr) / sr
+        y = np.concatenate([np.zeros(2 * sr), 0.5 * np.sin(2 * np.pi * 110.0 * t), np.zeros(2 * sr)])
+        
+        self.analyzer.analyze_audio_data(y, sr)
+        timeline = self.analyzer.activity_timeline
+        
+        assert timeline[0][0] == 0
+        assert timeline[-1][1] == pytest.approx(len(y) / sr)
+        assert [active for _, _, active in timeline] == [False, True, False]
+        for (_, end, _), (start, _, _) in zip(timeline, timeline[1:]):
+            assert end == start
+    
+    def test_gated_note_times(self):
+        """Test that notes found after a silence keep their absolute times"""
+        sr = 22050
+        t = np.arange(sr) / sr
+        y = np.concatenate([np.zeros(3 * sr), 0.5 * np.sin(2 * np.pi * 220.0 * t)])
+        
+        detected_notes = self.analyzer.analyze_audio_data(y, sr)
+        
+        assert len(detected_notes) > 0
+        for time, note, string, fret in detected_notes:
+            assert time >= 3.0 - 0.2
+            assert time <= 4.0 + 0.2
+        assert 'A3' in [note for _, note, _, _ in detected_notes]
+    
+    def test_to_float32(self):
+        """Test the int16 to float32 conversion used before analysis"""
+        samples = np.array([-32768, 0, 16384, 32767], dtype=np.int16)
+        converted = to_float32(samples)
+        
+        assert converted.dtype == np.float32
+        assert converted[0] == -1.0
+        assert converted[1] == 0.0
+        assert converted[2] == 0.5
+        assert converted.max() < 1.0
+        
+        # float32 input is passed through without a copy
+        floats = np.zeros(10, dtype=np.float32)
+        assert to_float32(floats) is floats
+        assert to_float32(np.zeros(10)).dtype == np.float32
+        
+        # Unsigned (8-bit WAV) samples are centred on their midpoint
+        unsigned = to_float32(np.array([0, 128, 192, 255], dtype=np.uint8))
+        assert unsigned.dtype == np.float32
+        assert unsigned[0] == -1.0
+        assert unsigned[1] == 0.0
+        assert unsigned[2] == 0.5
+        assert unsigned.max() < 1.0
+    
+    def test_note_name_to_midi(self):
+        """Test converting note names to MIDI numbers"""
+        assert note_name_to_midi('A4') == 69
+        assert note_name_to_midi('E2') == 40
+        assert note_name_to_midi('C#3') == 49
+        for note in ('E2', 'C#3', 'A4', 'C6'):
+            assert midi_to_note_name(note_name_to_midi(note)) == note
+    
+    def test_notes_to_array(self):
+        """Test packing detected notes into a compact array"""
+        notes = [(0.5, 'A2', 5, 0), (1.25, 'C#3', 5, 4), (2.0, 'C6', None, None)]
+        events = notes_to_array(notes)
+        
+        assert events.dtype == NOTE_EVENT_DTYPE
+        assert events.itemsize == 7
+        assert list(events['midi']) == [45, 49, 84]
+        assert list(events['string']) == [5, 5, -1]
+        assert list(events['fret']) == [0, 4, -1]
+        assert events['time'][1] == pytest.approx(1.25)
+        assert notes_to_array(events) is events
+    
+    def make_notes(self, onsets, frequencies, seconds, sr=44100, decay=8):
+        """Synthesize plucked notes starting at the given times"""
+        y = np.zeros(int(seconds * sr), dtype=np.float32)
+        for onset, freq in zip(onsets, frequencies):
+            start = int(round(onset * sr))
+            t = np.arange(len(y) - start) / sr
+            y[start:] = 0.5 * np.exp(-decay * t) * (np.sin(2 * np.pi * freq * t) + 0.4 * np.sin(4 * np.pi * freq * t))
+        return y
+    
+    def test_detect_onsets(self):
+        """Test that onsets are found to within a couple of milliseconds"""
+        sr = 44100
+        onsets = [0.2503, 0.5127, 0.7391, 1.0, 1.2222]
+        y = self.make_notes(onsets, [110.0, 146.83, 196.0, 246.94, 329.63], 1.5, sr)
+        
+        detected = self.analyzer._detect_onsets(y, sr) / sr
+        
+        assert len(detected) == len(onsets)
+        for found, expected in zip(detected, onsets):
+            assert found == pytest.approx(expected, abs=0.002)
+    
+    def test_onset_note_timing(self):
+        """Test that each note is reported once, at its onset, with the right pitch"""
+        sr = 44100
+        onsets = [0.5, 0.62, 0.74, 0.86, 2.0]
+        frequencies = [82.41, 110.0, 146.83, 196.0, 246.94]
+        y = self.make_notes(onsets, frequencies, 3.5, sr)
+        
+        detected_notes = self.analyzer.analyze_audio_data(y, sr)
+        
+        # Fast notes are kept apart and the final sustained note is not repeated
+        assert [note for _, note, _, _ in detected_notes] == ['E2', 'A2', 'D3', 'G3', 'B3']
+        for (time, _, _, _), expected in zip(detected_notes, onsets):
+            assert time == pytest.approx(expected, abs=0.002)
+    
+    def test_note_at_start(self):
+        """Test that a note starting on the very first sample is detected"""
+        sr = 44100
+        onsets = [0.0, 0.5, 1.0, 1.5]
+        y = self.make_notes(onsets, [110.0, 146.83, 196.0, 246.94], 2.5, sr)
+        
+        detected_notes = self.analyzer.analyze_audio_data(y, sr)
+        
+        assert [note for _, note, _, _ in detected_notes] == ['A2', 'D3', 'G3', 'B3']
+        for (time, _, _, _), expected in zip(detected_notes, onsets):
+            assert time == pytest.approx(expected, abs=0.002)
+    
+    def test_lone_sustained_note(self):
+        """Test that a single ringing note is reported once, however slowly it decays"""
+        sr = 44100
+        for note, freq in self.analyzer.guitar_open_strings.items():
+            for decay in (8, 1):
+                y = self.make_notes([0.0], [freq], 3.0, sr, decay=decay)
+                detected_notes = self.analyzer.analyze_audio_data(y, sr)
+                assert [(time, name) for time, name, _, _ in detected_notes] == [(0.0, note)]
+    
+    def test_analyze_buffer_views(self):
+        """Test analyzing int16 audio split across ring buffer views"""
+        sr = 44100
+        y = (self.make_notes([0.3, 0.8], [110.0, 196.0], 1.5, sr) * 32767).astype(np.int16)
+        split = len(y) // 3
+        
+        detected_notes = self.analyzer.analyze_buffer_views((y[split:], y[:split]), sr)
+        expected = self.analyzer.analyze_audio_data(np.concatenate((y[split:], y[:split])), sr)
+        assert detected_notes == expected
+        assert self.analyzer.analyze_buffer_views((y,), sr) == self.analyzer.analyze_audio_data(y, sr)
+    
+    def test_grid_note_timing(self):
+        """Test that the 0.1 s grid timing can still be selected"""
+        sr = 22050
+        y = self.make_notes([0.5], [220.0], 2.0, sr)
+        self.analyzer.note_timing = 'grid'
+        
+        detected_notes = self.analyzer.analyze_audio_data(y, sr)
+        
+        # A single sustained note is reported on several grid frames
+        assert len(detected_notes) > 1
+    
+    def test_analyze_batch(self):
+        """Test that batch analysis matches analyzing each clip on its own"""
+        sr = 44100
+        clips = [
+            self.make_notes([0.2, 0.9], [110.0, 196.0], 2.0, sr),
+            (self.make_notes([0.1, 0.4, 1.5], [146.83, 246.94, 329.63], 3.0, sr) * 32767).astype(np.int16),
+            np.zeros(sr, dtype=np.float32),
+            self.make_notes([1.0], [82.41], 2.5, sr),
+        ]
+        
+        batched = self.analyzer.analyze_batch(clips, sr)
+        
+        assert len(batched) == len(clips)
+        assert batched[2] == []
+        for clip, detected_notes in zip(clips, batched):
+            single = self.analyzer.analyze_audio_data(clip, sr)
+            assert [note for _, note, _, _ in detected_notes] == [note for _, note, _, _ in single]
+            for (batch_time, _, _, _), (single_time, _, _, _) in zip(detected_notes, single):
+                assert batch_time == pytest.approx(single_time)
+        assert [note for _, note, _, _ in batched[1]] == ['D3', 'B3', 'E4']
+    
+    def test_analyze_batch_small_batches(self):
+        """Test that splitting a batch by size does not change the results"""
+        sr = 22050
+        clips = [self.make_notes([0.1 * i], [220.0], 1.0 + 0.1 * i, sr) for i in range(6)]
+        expected = self.analyzer.analyze_batch(clips, sr)
+        
+        self.analyzer.batch_max_samples = 2 * sr
+        assert self.analyzer.analyze_batch(clips, sr) == expected
+        assert self.analyzer.analyze_batch([], sr) == []
+    
+    def test_detect_onsets_stacked(self):
+        """Test that onsets found across a zero-padded batch match each signal on its own"""
+        sr = 44100
+        signals = [
+            self.make_notes([0.0, 0.5, 1.0], [110.0, 146.83, 196.0], 1.5, sr),
+            self.make_notes([0.3], [329.63], 0.8, sr),
+            self.make_notes([0.0], [82.41], 0.01, sr),
+            np.zeros(sr, dtype=np.float32),
+        ]
+        lengths = np.array([len(signal) for signal in signals])
+        batch = np.zeros((len(signals), lengths.max()), dtype=np.float32)
+        for i, signal in enumerate(signals):
+            batch[i, :len(signal)] = signal
+        
+        # Small FFT blocks must give the same flux as one block per signal
+        self.analyzer.spectral_block_frames = 7
+        rows, onsets = self.analyzer._detect_onsets_stacked(batch, lengths, sr)
+        
+        assert list(rows) == [0, 0, 0, 1]
+        for i, signal in enumerate(signals):
+            self.analyzer.spectral_block_frames = 1000
+            assert list(onsets[rows == i]) == list(self.analyzer._detect_onsets(signal, sr))
+        assert onsets[0] <= 0.001 * sr
+    
+    def test_estimate_pitches(self):
+        """Test batched pitch estimation on buffers of different lengths"""
+        sr = 44100
+        t = np.arange(2048) / sr
+        buffers = [np.sin(2 * np.pi * 110.0 * t), np.sin(2 * np.pi * 329.63 * t[:1500]), np.zeros(1024)]
+        
+        frequencies, clarities = estimate_pitches(buffers, sr)
+        
+        assert frequencies[0] == pytest.approx(110.0, rel=0.002)
+        assert frequencies[1] == pytest.approx(329.63, rel=0.002)
+        assert np.isnan(frequencies[2])
+        assert clarities[2] == 0
+        for buffer, frequency in zip(buffers[:2], frequencies):
+            assert estimate_pitch(buffer, sr)[0] == pytest.approx(frequency)
@@ -0,0 +1,102 @@
+"""
+Tests for the capture health metrics
+"""
+import pytest
+from src.capture_metrics import CaptureMetrics
+
+class TestCaptureMetrics:
+    def setup_method(self):
+        """Set up metrics for 1024-sample chunks at 44.1 kHz"""
+        self.metrics = CaptureMetrics(chunk=1024, sample_rate=44100)
+    
+    def test_initialization(self):
+        """Test that new metrics start empty"""
+        assert self.metrics.chunks_read == 0
+        assert self.metrics.dropped_chunks == 0
+        assert self.metrics.drop_rate == 0.0
+        assert self.metrics.chunk_period == pytest.approx(1024 / 44100)
+        assert sum(self.metrics.latency_histogram) == 0
+    
+    def test_record_read(self):
+        """Test latency, jitter and buffer fill from successful reads"""
+        period = self.metrics.chunk_period
+        self.metrics.record_read(0.0, 0.003, buffer_fill=0)
+        self.metrics.record_read(0.003 + period - 0.008, 0.003 + period, buffer_fill=512)
+        self.metrics.record_read(0.003 + 2 * period, 0.003 + 2 * period + 0.030, buffer_fill=2048)
+        
+        assert self.metrics.chunks_read == 3
+        assert self.metrics.max_latency == pytest.approx(0.030)
+        assert self.metrics.max_jitter == pytest.approx(0.030)
+        
+        # 3 ms and 8 ms reads land in the 5 and 10 ms buckets, 30 ms in the 50 ms bucket
+        edges = list(CaptureMetrics.BUCKET_EDGES_MS)
+        assert self.metrics.latency_histogram[edges.index(5)] == 1
+        assert self.metrics.latency_histogram[edges.index(10)] == 1
+        assert self.metrics.latency_histogram[edges.index(50)] == 1
+        
+        # Jitter is only measured between consecutive reads
+        assert sum(self.metrics.jitter_histogram) == 2
+        assert self.metrics.jitter_histogram[0] == 1
+        
+        assert self.metrics.buffer_fill == 2048
+        assert self.metrics.max_buffer_fill == 2048
+        assert self.metrics.buffer_fill_ratio == 2.0
+    
+    def test_dropped_chunks(self):
+        """Test counting overflows and errors"""
+        self.metrics.record_read(0.0, 0.001)
+        self.metrics.record_overflow()
+        self.metrics.record_error()
+        self.metrics.record_read(1.0, 1.001)
+        
+        assert self.metrics.overflows == 1
+        assert self.metrics.errors == 1
+        assert self.metrics.dropped_chunks == 2
+        assert self.metrics.drop_rate == 0.5
+        # The gap after a drop should not show up as jitter
+        assert sum(self.metrics.jitter_histogram) == 0
+    
+    def test_slow_reads_overflow_bucket(self):
+        """Test that very slow reads land in the last bucket"""
+        self.metrics.record_read(0.0, 0.5)
+        assert self.metrics.latency_histogram[-1] == 1
+    
+    def test_reset(self):
+        """Test that reset clears all counters"""
+        self.metrics.record_read(0.0, 0.001, buffer_fill=100)
+        self.metrics.record_overflow()
+        self.metrics.reset()
+        
+        assert self.metrics.chunks_read == 0
+        assert self.metrics.overflows == 0
+        assert self.metrics.max_buffer_fill == 0
+        assert sum(self.metrics.latency_histogram) == 0
+    
+    def test_reporting(self):
+        """Test the dictionary and status bar summaries"""
+        self.metrics.record_read(0.0, 0.002, buffer_fill=1024)
+        self.metrics.record_overflow()
+        
+        report = self.metrics.as_dict()
+        assert report['chunks_read'] == 1
+        assert report['overflows'] == 1
+        assert report['max_latency_ms'] == pytest.approx(2.0)
+        assert len(report['latency_histogram']) == len(report['bucket_edges_ms']) + 1
+        
+        summary = self.metrics.summary()
+        assert "1 chunks" in summary
+        assert "1 dropped" in summary
+        assert "1.0 chunks" in summary
+    
+    def test_values_round_trip(self):
+        """Test flattening the metrics for sharing and loading them back"""
+        self.metrics.record_read(0.0, 0.003, buffer_fill=300)
+        self.metrics.record_read(0.03, 0.0333, buffer_fill=200)
+        self.metrics.record_error()
+        
+        values = self.metrics.to_values()
+        assert len(values) == CaptureMetrics.n_values()
+        
+        copy = CaptureMetrics(1024, 44100)
+        copy.load_values([float(value) for value in values])
+        assert copy.as_dict() == self.metrics.as_dict()
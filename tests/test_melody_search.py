@@ -0,0 +1,104 @@
+"""
+Tests for the melodic phrase search
+"""
+import pytest
+import numpy as np
+from src.analyze_audio import notes_to_array
+from src.melody_search import MelodyIndex
+
+class TestMelodyIndex:
+    def setup_method(self):
+        """Set up an index with a few short recordings"""
+        self.index = MelodyIndex(ngram_size=3)
+        # "Smoke on the Water" style riff in G, and the same riff in E
+        self.riff = [55, 58, 60, 55, 58, 61, 60]
+        self.index.add_recording('take_g', [40, 42] + self.riff + [43])
+        self.index.add_recording('take_e', [m - 3 for m in self.riff])
+        self.index.add_recording('other', [40, 45, 50, 55, 59, 64, 59, 55])
+
+    def test_initialization(self):
+        """Test that recordings are counted"""
+        assert len(self.index) == 3
+        assert len(MelodyIndex()) == 0
+
+    def test_transposed_match(self):
+        """Test that a phrase is found in any key"""
+        matches = self.index.search(self.riff)
+
+        assert ('take_g', 2, None) in matches
+        assert ('take_e', 0, None) in matches
+        assert all(recording_id != 'other' for recording_id, _, _ in matches)
+
+    def test_note_names(self):
+        """Test searching with note names"""
+        matches = self.index.search(['E2', 'A2', 'D3', 'G3'])
+        assert matches == [('other', 0, None)]
+
+    def test_short_query(self):
+        """Test a query shorter than the n-gram size"""
+        matches = self.index.search([50, 55])
+
+        # A fourth up only appears in 'other'
+        assert [note_index for _, note_index, _ in matches] == [0, 1, 2, 4]
+        assert all(recording_id == 'other' for recording_id, _, _ in matches)
+
+    def test_short_query_mismatches(self):
+        """Test a short query with a mismatch, answered from the single-interval index"""
+        # A fourth up followed by anything, or anything followed by a fourth up
+        matches = self.index.search([50, 55, 60], max_mismatches=1)
+        assert ('other', 0, None) in matches
+        assert ('take_g', 0, None) not in matches
+        for recording_id, note_index, _ in matches:
+            intervals = self.index.intervals[self.index.recording_numbers[recording_id]]
+            assert 5 in intervals[note_index:note_index + 2]
+
+        with pytest.raises(ValueError):
+            self.index.search([50, 55, 60], max_mismatches=2)
+
+    def test_mismatches(self):
+        """Test approximate matching with a wrong note in the phrase"""
+        phrase = list(self.riff)
+        phrase[3] += 1
+
+        assert self.index.search(phrase) == []
+        matches = self.index.search(phrase, max_mismatches=2)
+        assert ('take_g', 2, None) in matches
+
+        # Too many mismatches for any n-gram to survive uses the single-interval index
+        assert ('take_g', 2, None) in self.index.search(phrase, max_mismatches=3)
+
+    def test_match_times(self):
+        """Test that matches report note times for analyzed recordings"""
+        notes = [(0.5, 'E2', 6, 0), (1.0, 'G2', 6, 3), (1.5, 'A2', 5, 0), (2.0, 'C3', 5, 3), (2.5, 'D3', 4, 0)]
+        self.index.add_recording('analyzed', notes_to_array(notes))
+
+        matches = self.index.search(['B2', 'C#3', 'E3', 'F#3'])
+        assert len(matches) == 1
+        recording_id, note_index, time = matches[0]
+        assert recording_id == 'analyzed'
+        assert note_index == 1
+        assert time == pytest.approx(1.0)
+
+    def test_incremental_update(self):
+        """Test adding, replacing and removing recordings"""
+        self.index.add_recording('new', [62] + self.riff)
+        assert ('new', 1, None) in self.index.search(self.riff)
+
+        self.index.add_recording('new', [60, 62, 64, 65, 67])
+        assert all(recording_id != 'new' for recording_id, _, _ in self.index.search(self.riff))
+
+        self.index.remove_recording('take_e')
+        assert all(recording_id != 'take_e' for recording_id, _, _ in self.index.search(self.riff))
+        assert len(self.index) == 3
+
+    def test_large_library(self):
+        """Test finding a planted phrase in a larger random library"""
+        rng = np.random.default_rng(0)
+        index = MelodyIndex()
+        for i in range(500):
+            index.add_recording(i, rng.integers(40, 76, size=200))
+        phrase = [64, 67, 69, 70, 69, 67, 64, 62]
+        index.add_recording('planted', list(rng.integers(40, 76, size=50)) + phrase)
+
+        matches = index.search(phrase)
+        assert ('planted', 50, None) in matches
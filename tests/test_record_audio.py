@@ -4,8 +4,54 @@ Tests for the audio recording functionality
 import os
 import pytest
 import wave
+import multiprocessing
 import numpy as np
-from src.record_audio import AudioRecorder
+import pyaudio
+from src.capture_metrics import CaptureMetrics
+from src.record_audio import MAX_READ_ERRORS, AudioRecorder, _capture_worker, _wait_for_capture_start
+from src.shared_buffer import SharedRingBuffer
+
+
+class MockInputStream:
+    """Input stream that returns (or raises) the given chunks, then asks the capture loop to stop"""
+    def __init__(self, chunks, stop_event):
+        self.chunks = list(chunks)
+        self.stop_event = stop_event
+        self.closed = False
+    
+    def get_read_available(self):
+        return 512
+    
+    def read(self, chunk, exception_on_overflow=True):
+        data = self.chunks.pop(0)
+        if not self.chunks:
+            self.stop_event.set()
+        if isinstance(data, Exception):
+            raise data
+        return data.tobytes()
+    
+    def stop_stream(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+
+
+class MockPyAudio:
+    """Stands in for pyaudio.PyAudio, opening MockInputStream or failing to open"""
+    stream = None
+    open_error = None
+    
+    def open(self, **kwargs):
+        if MockPyAudio.open_error:
+            raise MockPyAudio.open_error
+        return MockPyAudio.stream
+    
+    def get_sample_size(self, sample_format):
+        return 2
+    
+    def terminate(self):
+        pass
 
 class TestAudioRecorder:
     def setup_method(self):
@@ -28,6 +74,8 @@ class TestAudioRecorder:
         
         # Close the recorder
         self.recorder.close()
+        if os.path.exists(os.path.join(self.test_dir, "capture_test.wav")):
+            os.remove(os.path.join(self.test_dir, "capture_test.wav"))
     
     def test_initialization(self):
         """Test that the recorder initializes with correct settings"""
@@ -90,6 +138,140 @@ class TestAudioRecorder:
         self.recorder.frames = []
         audio_data = self.recorder.get_audio_data()
         assert audio_data is None
+
+    def test_record_frame_metrics(self):
+        """Test that record_frame reports reads and overflows to the metrics and keeps lost frames as silence"""
+        class MockStream:
+            def __init__(self, errors):
+                self.errors = list(errors)
+            
+            def get_read_available(self):
+                return 256
+            
+            def read(self, chunk):
+                error = self.errors.pop(0)
+                if error:
+                    raise error
+                return np.zeros(chunk, dtype=np.int16).tobytes()
+        
+        self.recorder.stream = MockStream([None, IOError(pyaudio.paInputOverflowed, "Input overflowed"), None])
+        self.recorder.is_recording = True
+        self.recorder.frames = []
+        self.recorder.metrics.reset()
+        
+        assert self.recorder.record_frame() is True
+        assert self.recorder.record_frame() is False
+        assert self.recorder.record_frame() is True
+        
+        self.recorder.is_recording = False
+        self.recorder.stream = None
+        
+        assert len(self.recorder.frames) == 3
+        assert self.recorder.frames[1] == bytes(2 * self.recorder.chunk)
+        assert self.recorder.metrics.chunks_read == 2
+        assert self.recorder.metrics.overflows == 1
+        assert self.recorder.metrics.errors == 0
+        assert self.recorder.metrics.buffer_fill == 256
+
+    def test_capture_worker(self, monkeypatch):
+        """Test that the capture process loop fills the shared buffer and the WAV file and reports metrics"""
+        # An overflowed chunk is written as silence so later audio keeps its timing
+        stop_event = multiprocessing.Event()
+        chunks = [np.arange(i * 1024, (i + 1) * 1024, dtype=np.int16) for i in range(3)]
+        chunks.insert(1, IOError(pyaudio.paInputOverflowed, "Input overflowed"))
+        monkeypatch.setattr(MockPyAudio, 'stream', MockInputStream(chunks, stop_event))
+        monkeypatch.setattr(MockPyAudio, 'open_error', None)
+        monkeypatch.setattr(pyaudio, 'PyAudio', MockPyAudio)
+        
+        buffer = SharedRingBuffer.create(4096)
+        stats = multiprocessing.Array('d', CaptureMetrics.n_values(), lock=False)
+        status_reader, status_writer = multiprocessing.Pipe(duplex=False)
+        filename = os.path.join(self.test_dir, "capture_test.wav")
+        _capture_worker(buffer.name, stats, filename, pyaudio.paInt16, 1, 44100, 1024, stop_event, status_writer)
+        
+        assert _wait_for_capture_start(status_reader, 1) is None
+        
+        # The parent sees the child's metrics through the shared array
+        self.recorder._capture_stats = stats
+        metrics = self.recorder.update_capture_metrics()
+        assert metrics.chunks_read == 3
+        assert metrics.overflows == 1
+        assert metrics.buffer_fill == 512
+        assert MockPyAudio.stream.closed
+        assert buffer.write_cursor == 4096
+        expected = np.concatenate([chunks[0], np.zeros(1024, dtype=np.int16), chunks[2], chunks[3]])
+        assert np.array_equal(buffer.read(0, 4096)[0], expected)
+        with wave.open(filename, 'rb') as wf:
+            assert wf.getnframes() == 4096
+            assert np.array_equal(np.frombuffer(wf.readframes(4096), dtype=np.int16), expected)
+        buffer.close()
+    
+    def test_capture_worker_read_errors(self, monkeypatch):
+        """Test that the capture process exits after repeated read errors instead of spinning"""
+        stop_event = multiprocessing.Event()
+        chunks = [OSError("Device unavailable")] * (MAX_READ_ERRORS + 5)
+        chunks.insert(1, np.zeros(1024, dtype=np.int16))
+        monkeypatch.setattr(MockPyAudio, 'stream', MockInputStream(chunks, stop_event))
+        monkeypatch.setattr(MockPyAudio, 'open_error', None)
+        monkeypatch.setattr(pyaudio, 'PyAudio', MockPyAudio)
+        monkeypatch.setattr('src.record_audio.time.sleep', lambda seconds: None)
+        
+        buffer = SharedRingBuffer.create(4 * 1024 * (MAX_READ_ERRORS + 2))
+        stats = multiprocessing.Array('d', CaptureMetrics.n_values(), lock=False)
+        status_reader, status_writer = multiprocessing.Pipe(duplex=False)
+        filename = os.path.join(self.test_dir, "capture_test.wav")
+        _capture_worker(buffer.name, stats, filename, pyaudio.paInt16, 1, 44100, 1024, stop_event, status_writer)
+        
+        assert _wait_for_capture_start(status_reader, 1) is None
+        assert not stop_event.is_set()
+        # The good read in between resets the count of errors in a row
+        assert len(MockPyAudio.stream.chunks) == 5 - 1
+        self.recorder._capture_stats = stats
+        metrics = self.recorder.update_capture_metrics()
+        assert metrics.chunks_read == 1
+        assert metrics.errors == MAX_READ_ERRORS + 1
+        assert MockPyAudio.stream.closed
+        assert buffer.write_cursor == 1024 * (MAX_READ_ERRORS + 2)
+        buffer.close()
+    
+    def test_capture_worker_startup_error(self, monkeypatch):
+        """Test that a failure to open the input stream is reported to the parent"""
+        monkeypatch.setattr(MockPyAudio, 'open_error', OSError("No default input device"))
+        monkeypatch.setattr(pyaudio, 'PyAudio', MockPyAudio)
+        
+        buffer = SharedRingBuffer.create(4096)
+        status_reader, status_writer = multiprocessing.Pipe(duplex=False)
+        filename = os.path.join(self.test_dir, "capture_test.wav")
+        stats = multiprocessing.Array('d', CaptureMetrics.n_values(), lock=False)
+        _capture_worker(buffer.name, stats, filename, pyaudio.paInt16, 1, 44100, 1024, multiprocessing.Event(), status_writer)
+        
+        assert _wait_for_capture_start(status_reader, 1) == "No default input device"
+        assert not os.path.exists(filename)
+        buffer.close()
+    
+    def test_wait_for_capture_start_no_report(self):
+        """Test the messages when the capture process dies or hangs before reporting"""
+        status_reader, status_writer = multiprocessing.Pipe(duplex=False)
+        assert "no response" in _wait_for_capture_start(status_reader, 0.01)
+        
+        status_writer.close()
+        assert "exited" in _wait_for_capture_start(status_reader, 1)
+    
+    def test_get_capture_views(self):
+        """Test reading the capture process recording from the shared buffer"""
+        assert self.recorder.get_capture_views() is None
+        
+        self.recorder.capture_buffer = SharedRingBuffer.create(8)
+        self.recorder.capture_buffer.write(np.arange(6, dtype=np.int16))
+        views = self.recorder.get_capture_views()
+        assert np.array_equal(np.concatenate(views), np.arange(6))
+        
+        # Once the recording no longer fits it has to come from the file
+        self.recorder.capture_buffer.write(np.arange(6, dtype=np.int16))
+        assert self.recorder.get_capture_views() is None
+        
+        self.recorder.release_capture_buffer()
+        assert self.recorder.capture_buffer is None
 #think aobout putting these into a for loop and having some setup function get
 # the filename and cleanup, then just call the for loop, or add a for loop to each 
 #test and test more->or a combination?
@@ -0,0 +1,113 @@
+"""
+Tests for the shared memory ring buffer
+"""
+import multiprocessing
+import pytest
+import numpy as np
+from src.shared_buffer import SharedRingBuffer
+
+
+def _write_ramp(buffer_name, total, block):
+    """Write an increasing ramp of samples into a shared buffer from another process"""
+    buffer = SharedRingBuffer.attach(buffer_name)
+    for start in range(0, total, block):
+        buffer.write(np.arange(start, min(start + block, total), dtype=np.int16))
+    buffer.close()
+
+
+class TestSharedRingBuffer:
+    def setup_method(self):
+        """Set up a small buffer for each test"""
+        self.buffer = SharedRingBuffer.create(8)
+
+    def teardown_method(self):
+        """Release the shared memory"""
+        self.buffer.close()
+
+    def test_initialization(self):
+        """Test that a new buffer is empty"""
+        assert self.buffer.capacity == 8
+        assert self.buffer.write_cursor == 0
+        assert self.buffer.oldest_cursor == 0
+        assert self.buffer.name
+
+    def test_write_and_read(self):
+        """Test reading back written samples"""
+        self.buffer.write(np.array([1, 2, 3], dtype=np.int16))
+        views = self.buffer.read(0, 3)
+
+        assert self.buffer.write_cursor == 3
+        assert len(views) == 1
+        assert np.array_equal(views[0], [1, 2, 3])
+
+    def test_wraparound(self):
+        """Test that reads spanning the end of the buffer return two views"""
+        self.buffer.write(np.arange(6, dtype=np.int16))
+        self.buffer.write(np.arange(6, 12, dtype=np.int16))
+
+        assert self.buffer.write_cursor == 12
+        assert self.buffer.oldest_cursor == 4
+        views = self.buffer.read(4, 12)
+        assert len(views) == 2
+        assert np.array_equal(np.concatenate(views), np.arange(4, 12))
+
+    def test_read_is_zero_copy(self):
+        """Test that reads return views into shared memory"""
+        self.buffer.write(np.array([1, 2, 3], dtype=np.int16))
+        view = self.buffer.read(0, 3)[0]
+        self.buffer.write(np.array([4], dtype=np.int16))
+
+        assert not view.flags.owndata
+        assert np.shares_memory(view, self.buffer.read(0, 4)[0])
+
+    def test_oversized_write(self):
+        """Test that writing more than the capacity keeps the newest samples"""
+        self.buffer.write(np.arange(20, dtype=np.int16))
+
+        assert self.buffer.write_cursor == 20
+        assert np.array_equal(np.concatenate(self.buffer.read(12, 20)), np.arange(12, 20))
+
+    def test_invalid_reads(self):
+        """Test reading unwritten or overwritten samples"""
+        self.buffer.write(np.arange(10, dtype=np.int16))
+
+        with pytest.raises(ValueError):
+            self.buffer.read(5, 11)
+        with pytest.raises(ValueError):
+            self.buffer.read(1, 5)
+        assert not self.buffer.is_valid(1)
+        assert self.buffer.is_valid(2)
+
+    def test_reader_cursor(self):
+        """Test that a reader tracks its lag and consumes new samples"""
+        reader = self.buffer.reader()
+        self.buffer.write(np.array([1, 2, 3], dtype=np.int16))
+
+        assert reader.lag == 3
+        assert np.array_equal(np.concatenate(reader.read_available()), [1, 2, 3])
+        assert reader.lag == 0
+        assert reader.read_cursor == 3
+
+    def test_reader_overrun(self):
+        """Test that a reader that falls behind skips to the oldest sample"""
+        reader = self.buffer.reader()
+        self.buffer.write(np.arange(12, dtype=np.int16))
+
+        assert reader.overrun
+        assert np.array_equal(np.concatenate(reader.read_available()), np.arange(4, 12))
+        assert not reader.overrun
+
+    def test_write_from_other_process(self):
+        """Test that samples written by another process are visible here"""
+        buffer = SharedRingBuffer.create(1000)
+        try:
+            context = multiprocessing.get_context('spawn')
+            process = context.Process(target=_write_ramp, args=(buffer.name, 2500, 100))
+            process.start()
+            process.join(30)
+
+            assert process.exitcode == 0
+            assert buffer.write_cursor == 2500
+            assert np.array_equal(np.concatenate(buffer.read(1500, 2500)), np.arange(1500, 2500))
+        finally:
+            buffer.close()
@@ -0,0 +1,165 @@
+"""
+Tests for the SQLite tab library
+"""
+import os
+import pytest
+from src.analyze_audio import NOTE_EVENT_DTYPE, notes_to_array
+from src.melody_search import MelodyIndex
+from src.tab_library import TabLibrary
+
+class TestTabLibrary:
+    def setup_method(self):
+        """Set up a fresh library database"""
+        self.test_dir = "test_output"
+        if not os.path.exists(self.test_dir):
+            os.makedirs(self.test_dir)
+        self.db_path = os.path.join(self.test_dir, "test_tabs.db")
+        self.library = TabLibrary(self.db_path)
+        self.notes = [(0.5, 'E2', 6, 0), (1.0, 'A2', 5, 0), (1.5, 'C6', None, None)]
+
+    def teardown_method(self):
+        """Close and remove the database files"""
+        self.library.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.db_path + suffix):
+                os.remove(self.db_path + suffix)
+
+    def test_initialization(self):
+        """Test that the database is created in WAL mode with its indexes"""
+        assert os.path.exists(self.db_path)
+        mode = self.library.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
+
+        indexes = {row[1] for row in self.library.connection.execute("PRAGMA index_list(recordings)")}
+        assert {'idx_recordings_track_name', 'idx_recordings_created_at', 'idx_recordings_tuning'} <= indexes
+        assert self.library.count_tabs() == 0
+
+    def test_save_and_load(self):
+        """Test saving a tab and reading back each part"""
+        params = {'note_timing': 'onset', 'gate_on_db': -40}
+        recording_id = self.library.save_tab(
+            "Riff", "E|--0--|", detected_notes=self.notes, file_path="data/riff.wav",
+            sample_rate=44100, duration=2.0, params=params
+        )
+
+        recording = self.library.load_recording(recording_id)
+        assert recording['track_name'] == "Riff"
+        assert recording['tuning'] == "EADGBE"
+        assert recording['file_path'] == "data/riff.wav"
+        assert recording['sample_rate'] == 44100
+        assert self.library.load_tab(recording_id) == "E|--0--|"
+        assert self.library.load_notes(recording_id) == self.notes
+        assert self.library.load_params(recording_id) == params
+
+    def test_load_missing(self):
+        """Test loading a recording that does not exist"""
+        assert self.library.load_recording(999) is None
+        assert self.library.load_tab(999) is None
+        assert self.library.load_notes(999) == []
+        assert self.library.load_params(999) is None
+
+    def test_save_many(self):
+        """Test saving a batch of sessions in one call"""
+        sessions = [
+            {'track_name': f"Take {i}", 'tab_text': f"tab {i}", 'detected_notes': self.notes}
+            for i in range(50)
+        ]
+        ids = self.library.save_many(sessions)
+
+        assert len(ids) == 50
+        assert self.library.count_tabs() == 50
+        assert self.library.load_tab(ids[10]) == "tab 10"
+        assert len(self.library.load_notes(ids[49])) == 3
+
+    def test_save_many_is_atomic(self):
+        """Test that a failing session rolls back the whole batch"""
+        sessions = [
+            {'track_name': "Good", 'tab_text': "tab"},
+            {'track_name': "Bad", 'tab_text': None},
+        ]
+        with pytest.raises(Exception):
+            self.library.save_many(sessions)
+        assert self.library.count_tabs() == 0
+
+    def test_list_tabs(self):
+        """Test listing newest first with filters and paging"""
+        self.library.save_tab("Song A", "tab", created_at="2026-01-01T10:00:00")
+        self.library.save_tab("Song B", "tab", created_at="2026-01-03T10:00:00", tuning="DADGBE")
+        self.library.save_tab("Song A", "tab", created_at="2026-01-02T10:00:00")
+
+        listing = self.library.list_tabs()
+        assert [row[2] for row in listing] == ["2026-01-03T10:00:00", "2026-01-02T10:00:00", "2026-01-01T10:00:00"]
+        assert len(listing[0]) == 4
+
+        assert len(self.library.list_tabs(track_name="Song A")) == 2
+        assert [row[1] for row in self.library.list_tabs(tuning="DADGBE")] == ["Song B"]
+        assert self.library.count_tabs(track_name="Song A") == 2
+
+        assert len(self.library.list_tabs(limit=2)) == 2
+        assert self.library.list_tabs(limit=2, offset=2)[0][2] == "2026-01-01T10:00:00"
+
+    def test_delete(self):
+        """Test that deleting a recording removes its notes and tab"""
+        recording_id = self.library.save_tab("Riff", "tab", detected_notes=self.notes, params={})
+        self.library.delete(recording_id)
+
+        assert self.library.count_tabs() == 0
+        assert self.library.load_tab(recording_id) is None
+        assert self.library.load_notes(recording_id) == []
+        assert self.library.load_params(recording_id) is None
+
+    def test_iter_notes(self):
+        """Test reading every recording's notes in one pass"""
+        first = self.library.save_tab("Riff", "tab", detected_notes=self.notes)
+        self.library.save_tab("Empty", "tab")
+        second = self.library.save_tab("Riff 2", "tab", detected_notes=self.notes[:2])
+
+        recordings = list(self.library.iter_notes())
+        assert [recording_id for recording_id, _ in recordings] == [first, second]
+        assert recordings[0][1].dtype == NOTE_EVENT_DTYPE
+        assert list(recordings[0][1]['midi']) == [40, 45, 84]
+        assert list(recordings[0][1]['string']) == [6, 5, -1]
+        assert list(recordings[1][1]['time']) == [0.5, 1.0]
+
+    def test_save_note_array(self):
+        """Test saving notes given as a compact array"""
+        notes = [(0.123, 'E2', 6, 0), (1.0, 'C#3', 5, 4)]
+        recording_id = self.library.save_tab("Riff", "tab", detected_notes=notes_to_array(notes))
+        assert self.library.load_notes(recording_id) == notes
+
+    def test_melody_index(self):
+        """Test that an attached melody index follows the stored notes"""
+        riff = [(0.5, 'E2', 6, 0), (1.0, 'G2', 6, 3), (1.5, 'A2', 5, 0), (2.0, 'C3', 5, 3)]
+        stored = self.library.save_tab("Stored", "tab", detected_notes=riff)
+        self.library.close()
+
+        # Reopening fills the index from the database
+        index = MelodyIndex()
+        self.library = TabLibrary(self.db_path, melody_index=index)
+        assert index.search(['A2', 'C3', 'D3', 'F3']) == [(stored, 0, 0.5)]
+
+        # Saving and deleting keep it up to date
+        saved = self.library.save_tab("Saved", "tab", detected_notes=riff)
+        assert len(index.search(['A2', 'C3', 'D3', 'F3'])) == 2
+        self.library.delete(stored)
+        assert index.search(['A2', 'C3', 'D3', 'F3']) == [(saved, 0, 0.5)]
+
+    def test_attach_melody_index(self):
+        """Test that an index filled from an earlier state catches up when attached"""
+        riff = [(0.5, 'E2', 6, 0), (1.0, 'G2', 6, 3), (1.5, 'A2', 5, 0), (2.0, 'C3', 5, 3)]
+        deleted = self.library.save_tab("Deleted", "tab", detected_notes=riff)
+        kept = self.library.save_tab("Kept", "tab", detected_notes=riff)
+
+        # Filled through a second connection, as a background thread would
+        index = MelodyIndex()
+        other = TabLibrary(self.db_path)
+        index.add_library(other)
+        other.close()
+
+        self.library.delete(deleted)
+        added = self.library.save_tab("Added", "tab", detected_notes=riff)
+        self.library.attach_melody_index(index)
+
+        assert sorted(recording_id for recording_id, _, _ in index.search(['A2', 'C3', 'D3', 'F3'])) == [kept, added]
+        self.library.delete(kept)
+        assert [recording_id for recording_id, _, _ in index.search(['A2', 'C3', 'D3', 'F3'])] == [added]
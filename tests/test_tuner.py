@@ -0,0 +1,84 @@
+"""
+Tests for the live tuner
+"""
+import time
+import pytest
+import numpy as np
+from src.analyze_audio import AudioAnalyzer, estimate_pitch
+from src.tuner import Tuner
+
+def make_tone(frequency, seconds=0.1, sample_rate=44100):
+    """Synthesize a guitar-like tone with a few harmonics"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (np.sin(2 * np.pi * frequency * t)
+            + 0.5 * np.sin(2 * np.pi * 2 * frequency * t)
+            + 0.3 * np.sin(2 * np.pi * 3 * frequency * t)) / 2
+
+class TestTuner:
+    def setup_method(self):
+        """Set up a tuner with standard tuning"""
+        self.analyzer = AudioAnalyzer()
+        self.tuner = Tuner(self.analyzer.guitar_open_strings)
+
+    def test_initialization(self):
+        """Test that the defaults meet the latency and update rate targets"""
+        assert self.tuner.latency < 0.030
+        assert self.tuner.update_rate >= 30
+        assert self.tuner.reading is None
+
+    def test_estimate_open_strings(self):
+        """Test estimating the pitch of each open string from one short window"""
+        for note, frequency in self.analyzer.guitar_open_strings.items():
+            estimate, clarity = estimate_pitch(make_tone(frequency)[:1024], 44100)
+            assert estimate == pytest.approx(frequency, rel=0.002)
+            assert clarity > 0.9
+
+    def test_estimate_no_pitch(self):
+        """Test that silence and noise give no pitch"""
+        assert estimate_pitch(np.zeros(1024), 44100)[0] is None
+        noise = np.random.default_rng(0).standard_normal(1024)
+        assert estimate_pitch(noise, 44100)[0] is None
+
+    def test_cents_deviation(self):
+        """Test that a sharp string reads as sharp of the right open string"""
+        frequency = 110.0 * 2 ** (12 / 1200)  # A string 12 cents sharp
+        self.tuner.push(make_tone(frequency))
+        reading = self.tuner.reading
+
+        assert reading.note == 'A2'
+        assert reading.cents == pytest.approx(12, abs=1)
+        assert reading.string == 'A2'
+        assert reading.string_cents == pytest.approx(12, abs=1)
+
+    def test_nearest_string(self):
+        """Test picking the nearest open string for a fretted note"""
+        reading = self.tuner.describe(261.63)  # C4, between G3 and B3
+        assert reading.note == 'C4'
+        assert reading.cents == pytest.approx(0, abs=1)
+        assert reading.string == 'B3'
+
+    def test_push_int16(self):
+        """Test feeding int16 chunks as they come from the recorder"""
+        samples = (make_tone(196.0, seconds=0.5) * 20000).astype(np.int16)
+        for start in range(0, len(samples), 512):
+            reading = self.tuner.push(samples[start:start + 512])
+
+        assert reading.note == 'G3'
+        assert abs(reading.string_cents) < 2
+
+    def test_push_silence_clears_reading(self):
+        """Test that the reading goes away when the string stops"""
+        self.tuner.push(make_tone(82.41))
+        assert self.tuner.reading is not None
+        self.tuner.push(np.zeros(2048))
+        assert self.tuner.reading is None
+
+    def test_fixed_cost_per_update(self):
+        """Test that each update is far quicker than the time between updates"""
+        samples = make_tone(146.83, seconds=1.0)
+        start = time.perf_counter()
+        self.tuner.push(samples)
+        elapsed = time.perf_counter() - start
+
+        # One second of audio must be processed well within one second
+        assert elapsed < 0.5